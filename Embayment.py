@@ -13,6 +13,7 @@ import math
 #import matplotlib.mlab as mlab
 import EmbaymentPlot
 import EmbaymentNonlinear
+from ssamtm import peaks
 from optparse import OptionParser
 
 path = '/software/software/scientific/Matlab_files/Helmoltz/Embayments-Exact/LakeOntario-data'
@@ -84,12 +85,16 @@ class Embayment(object):
     printtitle = False
 
 
-    def __init__(self, name):
+    def __init__(self, name, hypsometry = None):
         '''
         Constructor
         '''
         # name can be: 'FMB', 'Emb_A', 'Tob-CIH', 'Tob-IBP'
+        # hypsometry: optional EmbaymentGeometry.Lookup, area and mouth cross
+        # section as functions of the water level instead of the constant
+        # A and B * H
         self.name = name
+        self.hypsometry = hypsometry
         dict = embayments[name]
         self.A = dict['A']
         self.B = dict['B']
@@ -223,7 +228,11 @@ class Embayment(object):
 
     @staticmethod
     def SpectralAnalysis(bay, filenames, names, b_wavelets = False, window = "hanning", num_segments = None, tunits = 'day', \
-                         funits = "Hz", filter = None, log = False, doy = False, grid = False, fname = None, domodel = False):
+                         funits = "Hz", filter = None, log = False, doy = False, grid = False, fname = None, domodel = False, \
+                         catalog = None):
+        '''
+        catalog: optional peaks.ModeCatalog; the significant peaks of every spectrum are added to it
+        '''
 
         # show extended calculation of spectrum analysis
         show = True
@@ -278,6 +287,8 @@ class Embayment(object):
             lake_name = names[1]
             bay_name = names[0]
         elif bay == 'Tob_All':
+            # catalog keys of the four records, as in the single bay runs
+            bay_codes = ['Tob-CIH', 'Tob-IBP', 'Tob-OBP', 'Tob-HI']
             fftsa1 = FFTGraphs.FFTGraphs(path4, 'LL4-28jul2010.csv', None, show, tunits)
             bay_names.append("Cove Island Harbour")
             fftsa2 = FFTGraphs.FFTGraphs(path4, 'LL1-28jul2010.csv', None, show, tunits)
@@ -299,10 +310,17 @@ class Embayment(object):
             showLevels = False
             detrend = False
             draw = False
-            fftsa1.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
-            fftsa2.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
-            fftsa3.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
-            fftsa4.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
+            res1 = fftsa1.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
+            res2 = fftsa2.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
+            res3 = fftsa3.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
+            res4 = fftsa4.doSpectralAnalysis(showLevels, draw, tunits, window, num_segments, filter, log)
+
+            if catalog is not None:
+                for code, fa, res in zip(bay_codes, [fftsa1, fftsa2, fftsa3, fftsa4], [res1, res2, res3, res4]):
+                    lower = fa.x05 if num_segments > 1 else None
+                    pk = peaks.find_peaks(fa.f, fa.mx, lower = lower)
+                    # res = [Time, y, x05, x95, fftx, freq, mx]
+                    catalog.add(code, res[0][0], res[0][-1], pk, np.angle(res[4], True))
 
             data = [fftsa1.mx, fftsa2.mx, fftsa3.mx, fftsa4.mx]
             ci05 = [fftsa1.x05, fftsa2.x05, fftsa3.x05, fftsa4.x05]
@@ -326,6 +344,16 @@ class Embayment(object):
                 print "Period %f  phase:%f  amplit:%f" % (1. / freq[i] / 3600, phase[i], mx[i])
             print "*****************************"
 
+            # significant peaks: lower CI bound (Welch) or the amplitude above the median background
+            lower = x05 if num_segments > 1 else None
+            pk = peaks.find_peaks(freq, mx, lower = lower)
+            print " PEAKs"
+            for p in pk:
+                print "Period %f  phase:%f  amplit:%f  ratio:%f" % (1. / p['freq'] / 3600, phase[p['index']], p['power'], p['ratio'])
+            print "*****************************"
+            if catalog is not None:
+                catalog.add(bay, Time[0], Time[-1], pk, phase)
+
             fftsa.plotLakeLevels(lake_name, bay_name, detrend, y_label=None, title=None, plottitle=Embayment.printtitle, doy = doy, grid = grid)
                                
             if bay == 'Tob-OBP' :  # to have the same scale as IBP
@@ -494,15 +522,49 @@ class Embayment(object):
     def EmbaymentFlow(self, A, HbVect, dt):
         '''
         calculates flow in the channel based on water level fluctuations in the
-        embayment
+        embayment; A is the bay area, a constant or one value per sample
         '''
+        HbVect = np.asarray(HbVect, dtype = float)
+        A = np.broadcast_to(np.asarray(A, dtype = float), HbVect.shape)
         Q = np.zeros(len(HbVect))
-        for i in range(1, len(HbVect)):
-            Q[i] = A * (HbVect[i - 1] - HbVect[i]) / dt
-        # end
+        # area between two samples
+        Q[1:] = 0.5 * (A[1:] + A[:-1]) * (HbVect[:-1] - HbVect[1:]) / dt
         return Q
     # end EmbaymentFlow
 
+    def Geometry(self, level):
+        '''
+        Bay area and mouth cross section for every sample of the water level
+        record, from the hypsometry lookup (the level anomaly added to its
+        datum) or the constant A and B * H
+        '''
+        if self.hypsometry is None:
+            return self.A, self.B * self.H
+        level = np.asarray(level, dtype = float)
+        z = self.hypsometry.datum + level - level.mean()
+        return self.hypsometry.area(z), self.hypsometry.section(z)
+    # end Geometry
+
+    @staticmethod
+    def Exchange(Q, level, area, section, dt):
+        '''
+        Inflow volume, summed level change and the net QWL flow of a flow
+        record Q and its water levels. area and section are constants or
+        per-sample arrays; as in the original loops the first sample is
+        differenced against level[-1] and Q[-1].
+        '''
+        level = np.asarray(level, dtype = float)
+        i = np.arange(len(Q) - 1)
+        area = np.broadcast_to(np.asarray(area, dtype = float), level.shape)
+        section = np.broadcast_to(np.asarray(section, dtype = float), level.shape)
+        dlevel = level[i] - level[i - 1]
+        inflow = ((Q[i] - Q[i - 1]) > 0) & (Q[i] > 0)
+        V = np.sum(((Q[i] + Q[i - 1]) / 2 * section[i])[inflow])
+        total = np.sum(0.5 * np.abs(dlevel))
+        QWL = abs(np.sum(area[i] * 0.5 * dlevel / dt))
+        return V, total, QWL
+    # end Exchange
+
     def CalculateFlow(self, days):
         '''
          Water exchange
@@ -527,57 +589,38 @@ class Embayment(object):
 
         # calculate flushing time
         [Time, SensorDepth] = fft_utils.readFile("", self.filename)
+        SensorDepth = np.asarray(SensorDepth, dtype = float)
 
         # Limit the time interval to the same number of days: days assuming that measuread days are more
         meas_days = int (Time[len(Time) - 1] - Time[1])
         interv = len(Time) * days / meas_days
-        Qm = self.EmbaymentFlow(self.A, SensorDepth[:interv], (Time[2] - Time[1]) * 86400)
-
-        Vm = 0
-        summeas = 0
-        for i in range(0, len(Qm) - 1):
-            summeas = summeas + 0.5 * np.abs(SensorDepth[i] - SensorDepth[i - 1])
-            if ((Qm[i] - Qm[i - 1]) > 0) and (Qm[i] > 0) :
-                Vm = Vm + (Qm[i] + Qm[i - 1]) / 2 * self.B * self.H
-            # end
-        # end
-        QWL=0
-        dt=(Time[2] - Time[1])* 86400
-        for i in range(0, len(Qm) - 1):
-            QWL = QWL + self.A * 0.5*(SensorDepth[i] - SensorDepth[i - 1]) / dt
-        QWL=abs(QWL)
-        
+        dt = (Time[2] - Time[1]) * 86400
+        Am, Om = self.Geometry(SensorDepth)
+        Qm = self.EmbaymentFlow(np.broadcast_to(Am, SensorDepth.shape)[:interv], SensorDepth[:interv], dt)
+
+        Vm, summeas, QWL = self.Exchange(Qm, SensorDepth, Am, Om, dt)
         print "V meas=%f Sum meas=%f QWL=%f" % (Vm, summeas, QWL)
-        Qp = self.EmbaymentFlow(self.A, R, (t[2] - t[1]))
-
-        Vp = 0
-        sumpred = 0
-        for i in range(0, len(Qp) - 1):
-            sumpred = sumpred + 0.5 * np.abs(R[i] - R[i - 1])
-            if ((Qp[i] - Qp[i - 1]) > 0) and (Qp[i] > 0) :
-                Vp = Vp + (Qp[i] + Qp[i - 1]) / 2 * self.B * self.H
-            # end
-        # end
-        QWL=0
-        for i in range(0, len(Qp) - 1):
-            QWL = QWL + self.A * 0.5*(R[i] - R[i - 1]) / dt
-        QWL=abs(QWL)
 
+        Ap, Op = self.Geometry(R)
+        Qp = self.EmbaymentFlow(Ap, R, (t[2] - t[1]))
+
+        Vp, sumpred, QWL = self.Exchange(Qp, R, Ap, Op, dt)
         print "V pred=%f, Sum pred=%f QWL=%f" % (Vp, sumpred, QWL)
 
+        # velocities through the mouth, half of the section of Tob-IBP
+        Om = np.broadcast_to(Om, SensorDepth.shape)[:interv]
+        Op = np.broadcast_to(Op, np.shape(R))
         if self.name == 'Tob-IBP':
-            Vm_max = np.max(Qm) / (self.B * self.H / 2)
-            Vp_max = np.max(Qp) / (self.B * self.H / 2)
-        else:
-            Vm_max = np.max(Qm) / (self.B * self.H)
-            Vp_max = np.max(Qp) / (self.B * self.H)
+            Om, Op = Om / 2, Op / 2
         # endif
+        Vm_max = np.max(Qm / Om)
+        Vp_max = np.max(Qp / Op)
         print "Bay=%s  Vm=%f m/s, Vp=%f m/s" % (self.name , Vm_max, Vp_max)
         print "Bay=%s  Qm=%f m^3/s, Qp=%f m^3/s" % (self.name, np.max(Qm), np.max(Qp))
     # end CalculateFlow
 
     @staticmethod
-    def CalculateSpectral(bay, domodel = False, numseg = 1):
+    def CalculateSpectral(bay, domodel = False, numseg = 1, catalog = None):
         showLevels = False
         detrend = False
         detrend = True
@@ -626,7 +669,8 @@ class Embayment(object):
 
             if doSpectral:
                 Embayment.SpectralAnalysis(bay, filenames, names, dowavelets, window, num_segments, \
-                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel)
+                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel, \
+                                           catalog = catalog)
 
 
 
@@ -666,7 +710,8 @@ class Embayment(object):
 
             if doSpectral:
                 Embayment.SpectralAnalysis(bay, filenames, names, dowavelets, window, num_segments, \
-                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel)
+                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel, \
+                                           catalog = catalog)
 
             tunits = 'day'
             slevel = 0.95
@@ -751,7 +796,8 @@ class Embayment(object):
 
             if doSpectral:
                 Embayment.SpectralAnalysis(bay, filenames, names, b_wavelets = dowavelets, window = window, num_segments = num_segments, \
-                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel)
+                                           tunits = tunits, funits = funits, filter = filter, log = log, doy = doy, grid = grid, fname = None, domodel = domodel, \
+                                           catalog = catalog)
 
             slevel = 0.95
             # range 0-65000 is good to catch the high frequencies
@@ -812,6 +858,7 @@ if __name__ == '__main__':
     parser.add_option("-n", "--nsegments", dest = "ns", action = "store", default = 1, help = "Number of (Welch) segments for the spectral analysis")
     parser.add_option("-f", "--flushing", dest = "fl", action = "store_true", default = False, help = "Flusing timescales")
     parser.add_option("-t", "--title", dest = "ti", action = "store_true", default = False, help = "Print graph titles")
+    parser.add_option("-c", "--catalog", dest = "ca", action = "store", default = None, help = "Seiche mode catalog (.npz) to add the spectral peaks to")
 
     (options, args) = parser.parse_args()
     if options.ti:
@@ -819,7 +866,10 @@ if __name__ == '__main__':
     if options.sp:
         model = options.mo
         print "* Calculate Spectral *"
-        Embayment.CalculateSpectral(bay, model, options.ns)
+        catalog = peaks.ModeCatalog(options.ca) if options.ca else None
+        Embayment.CalculateSpectral(bay, model, options.ns, catalog)
+        if catalog is not None:
+            catalog.save()
     else:
         print ">> Do NOT Calculate Spectral <<"
     if options.fl:
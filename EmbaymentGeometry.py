@@ -0,0 +1,176 @@
+'''
+Created on Oct 19, 2026
+
+Embayment geometry from a bathymetry raster and the shoreline polygon of a
+bay, in place of the hand typed A, B, H, L, h of Embayment.embayments.
+
+The elevations inside the polygon are gathered once (tile by tile, see
+bathymetry.masked_tiles) and sorted; the hypsometric curve is then a prefix
+sum over the sorted elevations, so the wet area, volume and mean depth at any
+water level are a searchsorted away and thousands of levels cost one
+vectorized call.  Curves are cached per (DEM, polygon, cell size).
+
+>>> dem = bathymetry.open_dem(path + '/Fathom_Five_Bathy.mat', 'FF')
+>>> geo = geometry(dem, bay, [(r0, c0), (r1, c1)], 179., channel, cell_size=2.)
+>>> geo['A'], geo['B'], geo['H'], geo['L'], geo['h']
+>>> hypsometry(dem, bay, 2.).table(np.linspace(170, 185, 5000))
+>>> emb = Embayment.Embayment('Tob-CIH', lookup(dem, bay, mouth, np.linspace(170, 185, 500), 176.))
+'''
+import numpy as np
+
+import bathymetry
+
+table_dtype = np.dtype([('level', np.float64), ('area', np.float64),
+                        ('volume', np.float64), ('mean_depth', np.float64)])
+
+# hypsometric curves already computed: (dem path, vertices, cell area) -> Hypsometry
+_curves = {}
+
+
+class Hypsometry(object):
+    '''
+    Area, volume and mean depth below a water level of a set of cells of
+    elevation z, each of area cell_area
+    '''
+
+    def __init__(self, elevations, cell_area = 1.):
+        z = np.asarray(elevations, dtype = np.float64).ravel()
+        self.z = np.sort(z[np.isfinite(z)])
+        self.cell_area = cell_area
+        # csum[k] = sum of the k lowest elevations, relative to the lowest one
+        # to keep the prefix sums small
+        self.z0 = self.z[0] if self.z.size else 0.
+        self.csum = np.concatenate(([0.], np.cumsum(self.z - self.z0)))
+
+    def __len__(self):
+        return self.z.size
+
+    def _wet(self, level):
+        # number of cells below the level
+        return np.searchsorted(self.z, level, side = 'left')
+
+    def area(self, level):
+        '''Wet (surface) area at the water level(s)'''
+        return self._wet(level) * self.cell_area
+
+    def volume(self, level):
+        '''Water volume below the water level(s)'''
+        level = np.asarray(level, dtype = np.float64)
+        k = self._wet(level)
+        return (k * (level - self.z0) - self.csum[k]) * self.cell_area
+
+    def mean_depth(self, level):
+        '''Volume / area, 0 where the polygon is dry'''
+        area = self.area(level)
+        return np.where(area > 0, self.volume(level) / np.maximum(area, self.cell_area), 0.)
+
+    def table(self, levels):
+        '''Lookup table of the curve at the given levels'''
+        levels = np.atleast_1d(np.asarray(levels, dtype = np.float64))
+        out = np.empty(levels.size, dtype = table_dtype)
+        out['level'] = levels
+        out['area'] = self.area(levels)
+        out['volume'] = self.volume(levels)
+        out['mean_depth'] = self.mean_depth(levels)
+        return out
+
+
+def hypsometry(dem, vertices, cell_size = 1.):
+    '''
+    Cached hypsometric curve of the cells of the tiled DEM inside the polygon
+    vertices [(row, col), ...]; cell_size is the cell side in metres (or a
+    (dy, dx) pair)
+    '''
+    dy, dx = np.broadcast_to(np.asarray(cell_size, dtype = float), (2,))
+    key = (dem.path, tuple(map(tuple, np.asarray(vertices, dtype = float))), dy * dx)
+    curve = _curves.get(key)
+    if curve is None:
+        parts = [t[mask] for r0, c0, t, mask in bathymetry.masked_tiles(dem, vertices)]
+        z = np.concatenate(parts) if parts else np.empty(0)
+        curve = _curves[key] = Hypsometry(z, dy * dx)
+    return curve
+
+def transect(dem, start, end, cell_size = 1.):
+    '''
+    Elevations sampled (nearest cell) about once per cell along the straight
+    line start -> end, (row, col) points, and the spacing of the samples in
+    metres
+    '''
+    dy, dx = np.broadcast_to(np.asarray(cell_size, dtype = float), (2,))
+    (ra, ca), (rb, cb) = start, end
+    n = int(np.ceil(np.hypot(rb - ra, cb - ca))) + 1
+    rows = np.clip(np.rint(np.linspace(ra, rb, n)).astype(int), 0, dem.shape[0] - 1)
+    cols = np.clip(np.rint(np.linspace(ca, cb, n)).astype(int), 0, dem.shape[1] - 1)
+    r0, c0 = rows.min(), cols.min()
+    window = dem.read((r0, rows.max() + 1), (c0, cols.max() + 1))
+    spacing = np.hypot((rb - ra) * dy, (cb - ca) * dx) / max(n - 1, 1)
+    return window[rows - r0, cols - c0], spacing
+
+def cross_section(z, spacing, level):
+    '''
+    Wet width and cross section area of a transect z at the water level(s)
+    '''
+    depth = np.asarray(level, dtype = np.float64)[..., None] - z
+    wet = depth > 0
+    width = wet.sum(axis = -1) * spacing
+    area = np.where(wet, depth, 0.).sum(axis = -1) * spacing
+    return width, area
+
+def path_length(points, cell_size = 1.):
+    '''Length in metres of the polyline through the (row, col) points'''
+    dy, dx = np.broadcast_to(np.asarray(cell_size, dtype = float), (2,))
+    d = np.diff(np.asarray(points, dtype = float), axis = 0)
+    return np.hypot(d[:, 0] * dy, d[:, 1] * dx).sum()
+
+def geometry(dem, bay, mouth, level, channel = None, cell_size = 1.):
+    '''
+    Embayment parameters at the water level, keyed as in Embayment.embayments:
+        A : bay surface area (m^2)
+        B : mouth width (m)
+        H : mouth mean depth, cross section / B (m)
+        L : channel length (m), the length of the `channel` polyline (None
+            without a channel)
+        h : bay mean depth (m)
+    and the mouth cross section 'O' = B * H.
+    bay and channel are (row, col) polylines, mouth the two end points of
+    the transect across the mouth.
+    '''
+    curve = hypsometry(dem, bay, cell_size)
+    z, spacing = transect(dem, mouth[0], mouth[1], cell_size)
+    B, O = cross_section(z, spacing, level)
+    return {'A': float(curve.area(level)),
+            'B': float(B),
+            'H': float(O / B) if B > 0 else 0.,
+            'L': float(path_length(channel, cell_size)) if channel is not None else None,
+            'h': float(curve.mean_depth(level)),
+            'O': float(O)}
+
+
+class Lookup(object):
+    '''
+    Interpolation tables of the bay area and the mouth cross section on a
+    grid of water levels; datum is the mean water level, the level records
+    of Embayment are anomalies around it
+    '''
+
+    def __init__(self, levels, area, section, datum = 0.):
+        self.levels = np.asarray(levels, dtype = np.float64)
+        self._area = np.asarray(area, dtype = np.float64)
+        self._section = np.asarray(section, dtype = np.float64)
+        self.datum = datum
+
+    def area(self, level):
+        return np.interp(level, self.levels, self._area)
+
+    def section(self, level):
+        return np.interp(level, self.levels, self._section)
+
+def lookup(dem, bay, mouth, levels, datum, cell_size = 1.):
+    '''
+    Lookup of the bay area (hypsometric curve of the bay polygon) and of the
+    cross section of the mouth transect at the given levels
+    '''
+    levels = np.asarray(levels, dtype = np.float64)
+    z, spacing = transect(dem, mouth[0], mouth[1], cell_size)
+    width, section = cross_section(z, spacing, levels)
+    return Lookup(levels, hypsometry(dem, bay, cell_size).area(levels), section, datum)
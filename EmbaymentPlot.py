@@ -5,7 +5,7 @@ import numpy as np
 import matplotlib.mlab as mlab
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, FormatStrFormatter
-from scipy.interpolate import interp1d
+from scipy.interpolate import interp1d, RegularGridInterpolator
 import utools.stats as ustats
 
 #############
@@ -17,6 +17,9 @@ g = 9.81
 # head loss due to flow separation
 f = 1.55
 
+# dimensionless response surfaces: (forcing grid, omega grid) -> array
+_surfaces = {}
+
 # special characters
 omega_char = unichr(0x3c9).encode('utf-8')
 alfa_char = unichr(0x3b1).encode('utf-8')
@@ -39,6 +42,11 @@ class EmbaymentPlot(object):
         self.Phase = bay.Phase
         self.Cd = bay.Cd
         self.w0 = None
+        # the response at the mean water level of the hypsometry lookup
+        hyps = getattr(bay, 'hypsometry', None)
+        if hyps is not None:
+            self.A = float(hyps.area(hyps.datum))
+            self.H = float(hyps.section(hyps.datum)) / self.B
 
 
         # local arrays
@@ -767,78 +775,85 @@ class EmbaymentPlot(object):
 
     # end def
 
-    def plotDimensionlessResponse(self, bbox = None, printtitle = False, grid = False):
-
-
-        embayments = {'FMB' : {'A':850000., 'B':25. , 'H':1., 'L':130.,
-                       'Period':[12.4, 5.2, 1.28, 0.8, 0.5, 0.36] ,  # h
-                       'Amplitude':[0.034, 0.022, 0.017, 0.023, 0.021, 0.022],  # m
-                       'Amplitude_bay':[0.024, 0.02, 0.014, 0.012, 0.0045, 0.002],  # m
-                       'Phase':[5, 22, -15, 39, -4.6, 0],  # rad
-                       'CD':0.0032},
-              'Tob-IBP' : {'A':145000., 'B':140. , 'H':2.143, 'L':570.,
-                       'Period':[16.8 / 60, 12.0 / 60, 8.0 / 60] ,  # min
-                       'Amplitude':[0.02, 0.018, 0.016],  # m
-                       'Amplitude_bay':[0.09, 0.043, 0.058],  # m
-                       'Phase':[0, 0, 0],  # rad
-                       'CD':0.0032},
-              'Tob-CIH' : {'A':64000., 'B':56. , 'H':1.9, 'L':175.,
-                       'Period':[16.8 / 60, 12.0 / 60, 9.2 / 60] ,  # h
-                       'Amplitude':[0.02, 0.018, 0.014],  # m
-                       'Amplitude_bay':[0.025, 0.078, 0.037],  # m
-                       'Phase':[0, 0, 0],  # rad
-                       'CD':0.0032}
-        }
-
-        Cd = 0.003;
+    def dimensionlessParams(self, embayments):
+        '''
+        Dimensionless forcing and bay amplitudes and frequencies w/w0 of all
+        the periods of the embayments, as flat arrays, with the embayment
+        name and period of each
+        '''
+        names, periods, cols = [], [], {'A':[], 'B':[], 'H':[], 'L':[], 'CD':[], 'Amplitude':[], 'Amplitude_bay':[]}
+        for key, value in embayments.iteritems():
+            n = len(value['Period'])
+            names += [key] * n
+            periods += list(value['Period'])
+            for c in cols:
+                cols[c] += list(np.broadcast_to(value[c], (n,)))
+        A, B, H, L, CD, Amplitude, Amplitude_bay = [np.array(cols[c], dtype = float)
+                                                    for c in ('A', 'B', 'H', 'L', 'CD', 'Amplitude', 'Amplitude_bay')]
+        T = np.array(periods, dtype = float)
+        O = B * H
+        fm = L * (f / L + CD / H)
+        DAmplE = A * fm / O / L * Amplitude
+        DAmplBay = A * fm / O / L * Amplitude_bay
+        w0 = np.sqrt(g * O / L / A)
+        wp = 2 * np.pi / (T * 3600) / w0
+        return names, T, DAmplE, DAmplBay, wp
+
+    def responseSurface(self, forcing, w):
+        '''
+        Relative dimensionless amplitude dl_amplitudef(F, w) / F on the grid
+        forcing x w (1-D arrays), in one broadcast call; surfaces are cached
+        by grid
+        '''
+        forcing = np.asarray(forcing, dtype = float)
+        w = np.asarray(w, dtype = float)
+        key = (forcing.tobytes(), w.tobytes())
+        surface = _surfaces.get(key)
+        if surface is None:
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                surface = self.dl_amplitudef(forcing[:, None], w[None, :]) / forcing[:, None]
+            surface.setflags(write = False)
+            _surfaces[key] = surface
+        return surface
+
+    def interpolateResponse(self, forcing, w, F, W):
+        '''
+        Bilinear interpolation of the cached surface on the grid forcing x w
+        at the points (F, W)
+        '''
+        surface = self.responseSurface(forcing, w)
+        interp = RegularGridInterpolator((np.asarray(forcing, dtype = float), np.asarray(w, dtype = float)),
+                                         surface, bounds_error = False, fill_value = np.nan)
+        return interp(np.column_stack((np.ravel(F), np.ravel(W)))).reshape(np.shape(F))
+
+    def plotDimensionlessResponse(self, bbox = None, printtitle = False, grid = False,
+                                  embayments = None, forcings = None, w = None):
+        '''
+        Relative dimensionless response vs w/w0 for each of the forcings
+        (default 0.04 * 3**k below 52) on the w grid (default 0 .. 3.5) and
+        the measured and calculated points of the embayments (default: FMB,
+        Tob-IBP and Tob-CIH of Embayment.embayments)
+        '''
+        if embayments is None:
+            import Embayment
+            embayments = dict((k, Embayment.embayments[k]) for k in ('FMB', 'Tob-IBP', 'Tob-CIH'))
+        if forcings is None:
+            forcings = 0.04 * 3. ** np.arange(int(np.ceil(np.log(52 / 0.04) / np.log(3))))
+        if w is None:
+            w = np.linspace(0.0, 3.5, 175)
 
         plt.figure()
 
-        start = 0.0;
-        stop = 3.5;
-        step = 0.02;
-        A_stop = 52;
-        A_start = 0.04;
-        A_step = 5;
-
-        maxidx = (stop - start) / step
-
-        arel = np.zeros((200, 200))
-        ixa = 0
-        steps = (stop - start) / step
-        ww = np.linspace(start , stop, steps)
-        A = A_start
-        while A < A_stop:
-            ixw = 1
-            for w in ww:
-                arel[ixa, ixw] = self.dl_amplitudef(A, w) / A
-                ixw += 1
-            # end
-            ixa += 1
-            A = A * 3
-        # end while
-
-        ixa = 0
-        w = np.linspace(start, stop, (stop - start) / step)
-        wint = np.linspace(start, stop, (stop - start) / step * 4)
+        arel = self.responseSurface(forcings, w)
+
         linestyle = ['r-', 'g:', 'b--', 'k-.', 'y-', 'c--', 'm:']
         marker = ['o', '*', '^', 'd', 's', '+', 'o']
 
-        A = A_start
-        cellgr = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
-
         legend = []
-        while A < A_stop:
-           ac = arel[ixa, :]
+        for ixa, A in enumerate(forcings):
            colr = np.mod(ixa, 6)
-           ls = linestyle[colr]
-           mk = marker[colr]
-           plt.plot(w, ac[:len(w)], ls, lw = 2 + 0.4 * ixa)
-           gg = 'forcing=%5.2f' % A
-           cellgr[ixa] = gg
-           legend.append(gg)
-           ixa += 1
-           A = A * 3
+           plt.plot(w, arel[ixa], linestyle[colr], lw = 2 + 0.4 * ixa)
+           legend.append('forcing=%5.2f' % A)
         # end
         if printtitle:
             plt.title('Amplification factor for a dimensionless forcing')
@@ -851,98 +866,45 @@ class EmbaymentPlot(object):
         plt.xticks(fontsize = 20)
         plt.yticks(fontsize = 20)
 
-        # dimesionless values
-        pmax = 0
-        for key, value in embayments.iteritems():
-            pmax += len(value['Period'])
-        # end for
-        ratioMeas = np.zeros(pmax, dtype = np.float)
-        ratioCalc = np.zeros(pmax, dtype = np.float)
-        ratioMeasNoOutl = np.zeros(pmax, dtype = np.float)
-        ratioCalcNoOutl = np.zeros(pmax, dtype = np.float)
+        # dimesionless values of all the periods at once
+        names, T, DAmplE, DAmplBay, wp = self.dimensionlessParams(embayments)
+        ratioMeas = DAmplBay / DAmplE
+        ratioCalc = self.dl_amplitudef(DAmplE, wp) / DAmplE
+        stxt = np.array(['%s(%.2f)' % (name, t) for name, t in zip(names, T)], dtype = np.dtype('a14'))
+
         outliers_emb = ['TOB-IBP', 'TOB-IBP']
         outliers_freq = ['0.13', '0.20']
+        outlier = np.in1d(stxt, np.array([e + o for e, o in zip(outliers_emb, outliers_freq)], dtype = stxt.dtype))
+        pmax = len(stxt)
+        ko = int(np.sum(~outlier))
+        ratioMeasNoOutl = np.zeros(pmax, dtype = np.float)
+        ratioCalcNoOutl = np.zeros(pmax, dtype = np.float)
+        ratioMeasNoOutl[:ko] = ratioMeas[~outlier]
+        ratioCalcNoOutl[:ko] = ratioCalc[~outlier]
 
-        stxt = np.zeros(pmax, dtype = np.dtype('a14'))
-
-
-        j = 0
-        for key, value in embayments.iteritems():
-
-            name = key
-            #print "embayment: %s" % name
+        if bbox:
+            bbox_props = dict(boxstyle = "square,pad=0.3", fc = "white", ec = "b", lw = 1)
+        else:
+            bbox_props = None
 
-            if bbox:
-                bbox_props = dict(boxstyle = "square,pad=0.3", fc = "white", ec = "b", lw = 1)
-            else:
-                bbox_props = None
-
-            dict = value
-            A = dict['A']
-            B = dict['B']
-            H = dict['H']
-            L = dict['L']
-            Period = dict['Period']
-            Amplitude = dict['Amplitude']
-            Amplitude_bay = dict['Amplitude_bay']
-            Phase = dict['Phase']
-            CD = dict['CD']
-
-            O = B * H
-            fm = L * (f / L + CD / H)
-            i = 0
-            ko = 0
-            for T in Period:
-                k = j * len(embayments) + i
-                DAmplE = A * fm / O / L * Amplitude[i]
-                DAmplBay = A * fm / O / L * Amplitude_bay[i]
-                w0 = np.sqrt(g * O / L / A)
-                freq = 1 / (T * 3600)
-                w = freq * 2 * np.pi
-                # dimensionless freq
-                wp = w / w0
-
-                # measured forcing
-                ratioMeas[k] = DAmplBay / DAmplE
-                #print "%d) rmeas:%f" % (k, ratioMeas[k]),
-                plt.plot(wp, ratioMeas[k], marker = marker[i], markersize = 13)
-                txt = '%s_M(%.2f h)' % (name, T)
-                plt.text(wp + 0.02, ratioMeas[k], txt, ha = 'left', va = 'center', bbox = bbox_props, fontsize = 15)
-
-
-                # draw veritical line at omega zero
-
-                # calculated forcing
-                DCalcAmplBay = self.dl_amplitudef(DAmplE, wp)
-                ratioCalc[k] = DCalcAmplBay / DAmplE
-                #print "  rcalc:%f" % ratioCalc[k]
-                plt.plot(wp, ratioCalc[k], marker = marker[i], markersize = 13)
-                txt = '%s_C(%.2f h)' % (name, T)
-                plt.text(wp + 0.02, ratioCalc[k], txt, ha = 'left', va = 'center', bbox = bbox_props, fontsize = 15)
-
-                stxt[k] = '%s(%.2f)' % (name, T)
-                plt.vlines(wp, 0, max(ratioMeas[k], ratioCalc[k]) + 0.03, linestyles = ':')
-
-                o = 0
-                bOutlier = False
-                for e in outliers_emb:
-                    oe = e + outliers_freq[o]
-                    if stxt[k] == oe:
-                        bOutlier = True
-                        break
-                    o += 1
-                # end for
-
-                # add to list if not outlier
-                if  not bOutlier:
-                    ratioMeasNoOutl[ko] = ratioMeas[k]
-                    ratioCalcNoOutl[ko] = ratioCalc[k]
-                    ko += 1
-
-                i += 1
-            # end for
-            j += 1
-        # end for in embayments
+        # k runs over all the periods of all the embayments, i within one
+        i = 0
+        for k in range(pmax):
+            if k > 0 and names[k] != names[k - 1]:
+                i = 0
+            name = names[k]
+            plt.plot(wp[k], ratioMeas[k], marker = marker[i], markersize = 13)
+            txt = '%s_M(%.2f h)' % (name, T[k])
+            plt.text(wp[k] + 0.02, ratioMeas[k], txt, ha = 'left', va = 'center', bbox = bbox_props, fontsize = 15)
+
+            plt.plot(wp[k], ratioCalc[k], marker = marker[i], markersize = 13)
+            txt = '%s_C(%.2f h)' % (name, T[k])
+            plt.text(wp[k] + 0.02, ratioCalc[k], txt, ha = 'left', va = 'center', bbox = bbox_props, fontsize = 15)
+
+            # draw veritical line at omega zero
+            plt.vlines(wp[k], 0, max(ratioMeas[k], ratioCalc[k]) + 0.03, linestyles = ':')
+            i += 1
+        # end for
 
         # plot a regression to estimate the accuracy of model prediction
         # statistics
@@ -4,21 +4,22 @@ from matplotlib.mlab import *
 import matplotlib.pyplot as plt
 from skimage.draw import line, polygon, circle, ellipse
 
+import bathymetry
 
-def plot_masked(data, vertices , offset):
-    """Plots the image masked outside of a circle using masked arrays"""
 
-    # Mask portions of the data array outside of the circle
-    # fill polygon
-    poly = np.array(vertices)
-    img = np.zeros(data.shape, 'uint8')
+def plot_masked(dem, vertices , offset):
+    """Plots the image masked outside of the polygon using masked arrays"""
 
-    rr, cc = polygon(poly[:, 0], poly[:, 1], data.shape)
-    img[rr, cc] = data[rr, cc] #- offset
+    # only the bounding box of the polygon is read from the tiled DEM, the
+    # elevations stay floats (a uint8 image wraps them modulo 256)
+    poly = np.array(vertices)
+    r0, c0 = np.maximum(poly.min(axis = 0).astype(int), 0)
+    r1, c1 = np.minimum(np.ceil(poly.max(axis = 0)).astype(int) + 1, dem.shape)
+    img = bathymetry.masked_array(dem, vertices, (r0, r1), (c0, c1)) - offset
 
     # Plot
     plt.figure()
-    im = plt.imshow(img, interpolation = 'bilinear')
+    im = plt.imshow(img, interpolation = 'bilinear', extent = (c0, c1, r1, r0))
     plt.title('Fathom Five Marine National Park')
     plt.colorbar(im)
 
@@ -29,14 +30,17 @@ def plot_masked(data, vertices , offset):
 
 
 
-def main():
-    mat = scipy.io.loadmat('/home/bogdan/Documents/UofT/PhD/Data_Files/Toberymory_tides/DEM/Fathom_Five_Bathy.mat')
-    data = mat['FF']
+def main(step = 1):
+    # converted to a tiled file next to the .mat on the first run
+    dem = bathymetry.open_dem('/home/bogdan/Documents/UofT/PhD/Data_Files/Toberymory_tides/DEM/Fathom_Five_Bathy.mat', 'FF')
+    # every step-th sample for the overview plots
+    data = dem.overview(step)
+    extent = (0, dem.shape[1], dem.shape[0], 0)
     fig = plt.figure()
     #extent = (-middle, middle, -middle, middle)
     #plt.imshow(data - 180, interpolation = 'nearest', extent = extent, origin = 'lower')
     offset = 179
-    im = plt.imshow(data - offset, interpolation = 'spline16')
+    im = plt.imshow(data - offset, interpolation = 'spline16', extent = extent)
     #im = plt.imshow(data, interpolation = 'bilinear')
 
     fig.colorbar(im)
@@ -52,7 +56,7 @@ def main():
 
 
 
-    plt.contour(data, levels, colors = colors, linewidths = linewidths)
+    plt.contour(data, levels, colors = colors, linewidths = linewidths, extent = extent)
     #plt.contour(data - 1 , colors = ['b'], linewidths = [1])
     #plt.contour(data + 1 , colors = ['g'], linewidths = [1])
 
@@ -66,8 +70,23 @@ def main():
     plt.title('Elevation within Fathom Five relative to Lake Level', fontsize = 18)
     #axis off
     vertices = [(y[0], x[0]), (y[1], x[1]), (y[2], x[2]), (y[3], x[3]), (y[4], x[4])]
-    plot_masked(data, vertices, offset)
+    plot_masked(dem, vertices, offset)
+
+    # H = histc(Inside2, [50 156 166 175 250]), streamed over the tiles
+    sizeFF, H = bathymetry.depth_histogram(dem, vertices, bathymetry.depth_edges)
+
     fig2 = plt.figure()
+    plt.bar(range(1, 5), H[:4] / float(sizeFF))
+    plt.ylabel('Percentage of total area', fontsize = 18)
+    plt.xticks(range(1, 5), bathymetry.depth_labels)
+    plt.title('Depth ranges as a fraction of total marine park', fontsize = 18)
+
+    fig3 = plt.figure()
+    plt.bar(range(1, 4), H[:3] / float(H[:3].sum()))
+    plt.ylabel('Percentage of total marine area', fontsize = 18)
+    plt.xticks(range(1, 4), bathymetry.depth_labels[:3])
+    plt.title('Depth ranges as a fraction of marine area of FF park', fontsize = 18)
+    plt.show()
 
     #mask = plt. poly2mask(x1, y1, 1801, 2801);
     #imshow(mask)
@@ -19,7 +19,8 @@ import matplotlib.pyplot as plt
 import time
 from mpl_toolkits.mplot3d import Axes3D
 from matplotlib import cm
-from matplotlib import animation
+import relaxation
+import animation
 
 class ShallowWater(object):
 
@@ -50,16 +51,18 @@ class ShallowWater(object):
         self.maxU = np.max(self.U)
 
     def drawNow(self, heightR):
-            self.surf.remove()
-            self.surf = self.ax.plot_surface(
-                self.x, self.y, heightR, rstride = 1, cstride = 1,
-                cmap = cm.jet, linewidth = 0, antialiased = False)
-            self.ax.set_zlim3d(0, self.maxU)
+            # new heights into the existing surface, the limits stay
+            self.view.update((heightR,))
             plt.draw()  # redraw the canvas
             # time.sleep(1)
 
-    def calculate(self):
-        m = 21;
+    def calculate(self, frames = (0, 100, 250, 499), tfinal = 500, tol = 0.,
+                  method = 'jacobi'):
+        if method == 'multigrid':
+            # multigrid needs 2**k + 1 points per side and fixed edges
+            m, boundary = 17, 'dirichlet'
+        else:
+            m, boundary = 21, 'neumann'
         # [x,y] = ndgrid(-1: 2/(m-1): 1);
         a = np.linspace(-1, 1, m)
         b = np.linspace(-1, 1, m)
@@ -81,8 +84,8 @@ class ShallowWater(object):
         self.ax = fig.gca(projection = '3d')
 
         self.maxU = np.max(U)
-        self.ax.set_zlim3d(0, self.maxU)
-        self.surf = self.ax.plot_surface(self.x, self.y, U)
+        self.view = animation.SurfaceView(self.ax, self.x, self.y, U,
+                                          zlim = (0, self.maxU))
 
         plt.draw()
         self.ax.grid(b = True, which = 'both')
@@ -96,70 +99,55 @@ class ShallowWater(object):
         # colormap(cyan)
         # pause(1)
 
-        # # Indices in the four compass directions.
-        a1 = np.array(range(1, m))
-        a2 = np.array([m - 1])
-        n = np.concatenate((a1, a2), axis = 1)
-        e = n
-        s = np.concatenate((np.array([0]), np.array(range(0, m - 1))), axis = 1)
-        w = s;
         # # A relation parameter. Try other values.
         # Experiment with omega slightly greater than one.
         omega = 1
 
         # # Relax.
-        # Repeatedly replace grid values by relaxed average of four neighbors.
-        tfinal = 500
-        for t in range(0, tfinal):  # t = 1:tfinal
-            # print t
-            U = (1 - omega) * U + omega * (U[n, :] + U[:, e] + U[s, :] + U[:, w]) / 4;
-            # plt.set()  # set(h,'zdata',U);
-            # axis(ax)
-            # drawnow
+        # Repeatedly replace grid values by relaxed average of four neighbors,
+        # with in place slices (see relaxation.py); the surface is only
+        # redrawn on the requested frames. Stops after tfinal sweeps or once
+        # a sweep changes U by less than tol.
+        def draw(t, U):
             self.ax.view_init(15, 0.1 * t)
             self.drawNow(U)
 
-        plt.show()
-
-
-    def init(self):
-
-        zero = np.zeros(self.U.shape)
-        zero.fill(-1)
-        # self.ax.grid(b = True, which = 'both')
-        self.surf = self.ax.plot_surface(self.x, self.y, zero)
-        self.ax.set_zlim((0, self.maxU))
-        self.ax.set_zlim3d((0, self.maxU))
-        self.fig.canvas.draw()
-        return [self.surf]
+        U, t, change = relaxation.relax(U, omega = omega if method == 'jacobi' else None,
+                                        method = method, boundary = boundary,
+                                        tol = tol, maxiter = tfinal,
+                                        frames = frames, callback = draw)
+        if t not in frames:
+            draw(t, U)
 
-    def animate(self, i):
-        self.U = (1 - self.omega) * self.U + self.omega * (self.U[self.n, :] + self.U[:, self.e] + self.U[self.s, :] + self.U[:, self.w]) / 4;
-
-        self.surf.remove()
+        plt.show()
+        return U
 
-        # self.ax.cla()
-        self.ax.set_zlim3d(0, self.maxU)
-        self.ax.set_xlim((-1, 1))
-        self.ax.set_ylim((-1, 1))
-        self.ax.set_zlim((0, self.maxU))
-        self.surf = self.ax.plot_surface(
-                self.x, self.y, self.U, rstride = 1, cstride = 1,
-                cmap = cm.jet, linewidth = 0, antialiased = False)
 
-        self.ax.view_init(15, 0.1 * i)
+    def sweeps(self, relax, frames):
+        # the relaxed grid at each of the requested sweeps
+        for f in frames:
+            while relax.iterations < f:
+                relax.sweep()
+            yield relax.U, relax.iterations
 
-        self.fig.canvas.draw()
-        return [self.surf]
+    def calculate2(self, frames = range(0, 500, 5)):
+        # frames: the sweeps to render; the sweeps run in a producer thread
+        # a few frames ahead of the display, the surface is updated in place
+        relax = relaxation.Relaxation(self.U, omega = self.omega)
+        self.view = animation.SurfaceView(self.ax, self.x, self.y, self.U,
+                                          zlim = (0, self.maxU))
+        queue = animation.FrameQueue(self.sweeps(relax, frames), maxsize = 8)
 
-    def calculate2(self):
+        def turn(frame):
+            self.ax.view_init(15, 0.1 * frame[1])
 
         # instantiate the animator.
-        anim = animation.FuncAnimation(self.fig, self.animate, init_func = self.init,
-                               frames = 500, interval = 2, blit = True)
+        anim = animation.animate(self.fig, [self.view], queue, interval = 2,
+                                 callback = turn)
 
 
         plt.show()
+        queue.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,246 @@
+"""
+Incremental animation of solver output.
+
+The views create their artist once and afterwards only change its data:
+ImageView (imshow, set_data), LineView (1-D profiles, set_ydata) and
+SurfaceView (plot_surface, whose quad vertices are rewritten in a
+preallocated array and coloured through set_array), the axis limits are
+fixed up front.
+ContourView is the exception, matplotlib contours cannot be updated so
+only its own line collections are replaced.
+
+FrameQueue runs the solver in a producer thread and puts a copy of every
+`every`-th state in a bounded queue, so the solver runs at its own rate and
+never further ahead than maxsize frames of the display.
+
+>>> sw = ShallowWater2D(eta_start, u_start, v_start)
+>>> fig, ax = plt.subplots()
+>>> frames = FrameQueue(sw.evolve(), every=20, maxsize=8)
+>>> anim = animate(fig, [ImageView(ax, eta_start, vmin=.9, vmax=1.1)], frames)
+>>> plt.show()
+"""
+
+import threading
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import numpy as np
+from matplotlib import animation, cm, colors
+
+_stop = object()
+
+def _first(frame):
+    return frame[0]
+
+
+def copy_state(state):
+    """
+    Copy of the arrays of a solver state (solvers reuse their buffers)
+    """
+    return tuple(np.array(a) if isinstance(a, np.ndarray) else a
+                 for a in state)
+
+
+class FrameQueue(object):
+    """
+    Iterates the frames produced by a background thread that steps
+    `trajectory` (any iterable of solver states, e.g. ShallowWater2D.evolve()
+    or evolveEuler) and keeps every `every`-th state, passed through select
+    (copy_state by default).  Iteration ends with the trajectory, or after
+    nframes frames; errors of the solver are raised in the reader.
+    """
+
+    def __init__(self, trajectory, every=1, maxsize=4, nframes=None,
+                 select=copy_state):
+        self.every = every
+        self.nframes = nframes
+        self.select = select
+        self._trajectory = trajectory
+        self._queue = queue.Queue(maxsize)
+        self._done = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        # blocks while the queue is full, gives up once closed
+        while not self._done.is_set():
+            try:
+                self._queue.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _work(self):
+        count = 0
+        try:
+            for step, state in enumerate(self._trajectory):
+                if step % self.every:
+                    continue
+                if not self._put(self.select(state)):
+                    return
+                count += 1
+                if self.nframes is not None and count >= self.nframes:
+                    break
+        except Exception as e:
+            self._error = e
+        self._put(_stop)
+
+    def get(self, timeout=None):
+        """
+        Next frame; raises StopIteration at the end of the run
+        """
+        if self._done.is_set():
+            raise StopIteration
+        item = self._queue.get(timeout=timeout)
+        if item is _stop:
+            self._done.set()
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        return item
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.get()
+            except StopIteration:
+                return
+
+    def close(self):
+        """
+        Stop the producer (it ends at its next frame)
+        """
+        self._done.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+class ImageView(object):
+    """
+    imshow of a 2-D field, field(frame) selects it (default frame[0])
+    """
+
+    def __init__(self, ax, data, field=_first, vmin=None, vmax=None,
+                 cmap=cm.jet, **kw):
+        self.field = field
+        self.image = ax.imshow(data, vmin=vmin, vmax=vmax, cmap=cmap,
+                               animated=True, **kw)
+
+    def update(self, frame):
+        self.image.set_data(self.field(frame))
+        return [self.image]
+
+
+class LineView(object):
+    """
+    Profile of a 1-D field along x
+    """
+
+    def __init__(self, ax, x, data, field=_first, ylim=None, **kw):
+        self.field = field
+        self.line, = ax.plot(x, data, animated=True, **kw)
+        ax.set_xlim(np.min(x), np.max(x))
+        if ylim is not None:
+            ax.set_ylim(ylim)
+
+    def update(self, frame):
+        self.line.set_ydata(self.field(frame))
+        return [self.line]
+
+
+class ContourView(object):
+    """
+    Contour lines of a 2-D field, redrawn every frame (matplotlib cannot
+    update a contour set in place)
+    """
+
+    def __init__(self, ax, data, levels, field=_first, **kw):
+        self.ax = ax
+        self.levels = levels
+        self.field = field
+        self.kw = kw
+        self.contours = ax.contour(data, levels, **kw)
+
+    def update(self, frame):
+        for c in list(getattr(self.contours, 'collections', [self.contours])):
+            c.remove()
+        self.contours = self.ax.contour(self.field(frame), self.levels, **self.kw)
+        return list(getattr(self.contours, 'collections', [self.contours]))
+
+
+class SurfaceView(object):
+    """
+    3-D surface of a 2-D field on the grid x, y (every cell drawn).  The
+    quads are built once; each update writes the new heights into the z
+    column of the vertex array and the cell mean heights into the colour
+    array.
+    """
+
+    def __init__(self, ax, x, y, data, field=_first, zlim=None, cmap=cm.jet,
+                 **kw):
+        self.field = field
+        z = np.asarray(data, dtype=float)
+        if zlim is None:
+            zlim = (z.min(), z.max())
+        self.norm = colors.Normalize(*zlim)
+        self.surface = ax.plot_surface(x, y, z, rstride=1, cstride=1,
+                                       cmap=cmap, norm=self.norm,
+                                       linewidth=0, antialiased=False, **kw)
+        ax.set_xlim(np.min(x), np.max(x))
+        ax.set_ylim(np.min(y), np.max(y))
+        ax.set_zlim(zlim)
+        m, n = z.shape
+        # corners of cell (i, j) in plot_surface order
+        self._corners = ((0, 0), (0, 1), (1, 1), (1, 0))
+        self._verts = np.empty((m - 1, n - 1, 4, 3))
+        for k, (di, dj) in enumerate(self._corners):
+            self._verts[:, :, k, 0] = np.asarray(x)[di:m - 1 + di, dj:n - 1 + dj]
+            self._verts[:, :, k, 1] = np.asarray(y)[di:m - 1 + di, dj:n - 1 + dj]
+        self._zc = np.empty((m - 1, n - 1))
+        self._set(z)
+
+    def update(self, frame):
+        self._set(self.field(frame))
+        return [self.surface]
+
+    def _set(self, z):
+        m, n = z.shape
+        zc = self._zc
+        zc[...] = 0.
+        for k, (di, dj) in enumerate(self._corners):
+            corner = z[di:m - 1 + di, dj:n - 1 + dj]
+            self._verts[:, :, k, 2] = corner
+            zc += corner
+        zc *= .25
+        self.surface.set_verts(self._verts.reshape(-1, 4, 3))
+        # the surface is a ScalarMappable (cmap, norm): its array sets the
+        # face colours at draw time
+        self.surface.set_array(zc.ravel())
+
+
+def animate(fig, views, frames, interval=30, blit=False, callback=None,
+            **kw):
+    """
+    FuncAnimation drawing the frames (a FrameQueue or any iterable) with
+    the views; callback(frame) runs after the views, e.g. to turn a 3-D
+    view.  blit=True for 2-D views only.
+    """
+    def update(frame):
+        artists = []
+        for view in views:
+            artists.extend(view.update(frame))
+        if callback is not None:
+            callback(frame)
+        return artists
+
+    kw.setdefault('save_count', 100)
+    return animation.FuncAnimation(fig, update, frames=iter(frames),
+                                   interval=interval, blit=blit, **kw)
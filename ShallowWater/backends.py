@@ -0,0 +1,202 @@
+"""
+Compute backends for the shallow water step.
+
+Every backend implements the Euler step of shallowwater_base.step (same
+non-conservative equations, periodic balanced differences) as
+
+    step(eta, u, v, g, dt, grid_spacing, b=0.)        -> eta, u, v
+    run(eta, u, v, g, dt, grid_spacing, nsteps, b=0.) -> eta, u, v
+
+numpy : np.roll stencils, always available
+numba : one fused loop kernel for the stencil and the update, compiled with
+        njit(cache=True) so the machine code is stored next to this file and
+        reused by later runs; run() keeps the whole time loop compiled
+jax   : jax.jit of the step and a lax.fori_loop for run, on the CPU
+
+This replaces the theano.scan graph of shallowwater_theano.evolveTime, whose
+size (and compile time) grows with the number of steps: here the kernel is
+compiled once per array type and the number of steps is a runtime argument.
+
+>>> eta, u, v = get_backend('numba').run(eta, u, v, g, dt, grid_spacing, 3000)
+>>> benchmark()
+"""
+
+import time as _time
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+class NumpyBackend(object):
+    name = 'numpy'
+
+    def step(self, eta, u, v, g, dt, grid_spacing, b=0.):
+        c = dt / (2. * grid_spacing)
+        ddx = lambda A: np.roll(A, -1, 1) - np.roll(A, 1, 1)
+        ddy = lambda A: np.roll(A, -1, 0) - np.roll(A, 1, 0)
+        du = -g * c * ddx(eta) - dt * b * u
+        dv = -g * c * ddy(eta) - dt * b * v
+        deta = -c * (ddx(u * eta) + ddy(v * eta))
+        return eta + deta, u + du, v + dv
+
+    def run(self, eta, u, v, g, dt, grid_spacing, nsteps, b=0.):
+        for _ in range(nsteps):
+            eta, u, v = self.step(eta, u, v, g, dt, grid_spacing, b)
+        return eta, u, v
+
+
+def _kernel(eta, u, v, g, dt, grid_spacing, b, eta_out, u_out, v_out):
+    # stencil and Euler update fused in one pass, periodic indices
+    ny, nx = eta.shape
+    c = dt / (2. * grid_spacing)
+    for i in range(ny):
+        ip = i + 1 if i + 1 < ny else 0
+        im = i - 1 if i > 0 else ny - 1
+        for j in range(nx):
+            jp = j + 1 if j + 1 < nx else 0
+            jm = j - 1 if j > 0 else nx - 1
+            u_out[i, j] = u[i, j] - g * c * (eta[i, jp] - eta[i, jm]) \
+                - dt * b * u[i, j]
+            v_out[i, j] = v[i, j] - g * c * (eta[ip, j] - eta[im, j]) \
+                - dt * b * v[i, j]
+            eta_out[i, j] = eta[i, j] \
+                - c * (u[i, jp] * eta[i, jp] - u[i, jm] * eta[i, jm]) \
+                - c * (v[ip, j] * eta[ip, j] - v[im, j] * eta[im, j])
+
+def _run_kernel(eta, u, v, g, dt, grid_spacing, b, nsteps):
+    # double buffered time loop
+    e0, u0, v0 = eta.copy(), u.copy(), v.copy()
+    e1, u1, v1 = np.empty_like(eta), np.empty_like(u), np.empty_like(v)
+    for _ in range(nsteps):
+        _kernel(e0, u0, v0, g, dt, grid_spacing, b, e1, u1, v1)
+        e0, e1 = e1, e0
+        u0, u1 = u1, u0
+        v0, v1 = v1, v0
+    return e0, u0, v0
+
+if njit is not None:
+    # compiled lazily on first call, machine code cached on disk
+    _kernel = njit(cache=True)(_kernel)
+    _run_kernel = njit(cache=True)(_run_kernel)
+
+
+class NumbaBackend(object):
+    name = 'numba'
+
+    def __init__(self):
+        if njit is None:
+            raise ImportError("numba is not installed.")
+
+    def step(self, eta, u, v, g, dt, grid_spacing, b=0.):
+        out = np.empty_like(eta), np.empty_like(u), np.empty_like(v)
+        _kernel(eta, u, v, float(g), float(dt), float(grid_spacing),
+                float(b), *out)
+        return out
+
+    def run(self, eta, u, v, g, dt, grid_spacing, nsteps, b=0.):
+        return _run_kernel(eta, u, v, float(g), float(dt),
+                           float(grid_spacing), float(b), int(nsteps))
+
+
+class JaxBackend(object):
+    name = 'jax'
+
+    def __init__(self):
+        import jax
+        import jax.numpy as jnp
+        from jax import lax
+
+        jax.config.update('jax_enable_x64', True)
+        self._cpu = jax.devices('cpu')[0]
+
+        def step(eta, u, v, g, dt, grid_spacing, b):
+            c = dt / (2. * grid_spacing)
+            ddx = lambda A: jnp.roll(A, -1, 1) - jnp.roll(A, 1, 1)
+            ddy = lambda A: jnp.roll(A, -1, 0) - jnp.roll(A, 1, 0)
+            du = -g * c * ddx(eta) - dt * b * u
+            dv = -g * c * ddy(eta) - dt * b * v
+            deta = -c * (ddx(u * eta) + ddy(v * eta))
+            return eta + deta, u + du, v + dv
+
+        def run(eta, u, v, g, dt, grid_spacing, b, nsteps):
+            body = lambda i, s: step(s[0], s[1], s[2], g, dt, grid_spacing, b)
+            return lax.fori_loop(0, nsteps, body, (eta, u, v))
+
+        self._step = jax.jit(step)
+        self._runj = jax.jit(run)
+
+    def _put(self, *arrays):
+        import jax
+        return [jax.device_put(a, self._cpu) for a in arrays]
+
+    def step(self, eta, u, v, g, dt, grid_spacing, b=0.):
+        out = self._step(*(self._put(eta, u, v) + [g, dt, grid_spacing, b]))
+        return tuple(np.asarray(a) for a in out)
+
+    def run(self, eta, u, v, g, dt, grid_spacing, nsteps, b=0.):
+        out = self._runj(*(self._put(eta, u, v) + [g, dt, grid_spacing, b,
+                                                   nsteps]))
+        return tuple(np.asarray(a) for a in out)
+
+
+backend_classes = {'numpy': NumpyBackend, 'numba': NumbaBackend,
+                   'jax': JaxBackend}
+_loaded = {}
+
+def get_backend(name='numpy'):
+    """
+    Backend instance by name (created, and compiled, once per process).
+    Raises ImportError when the package behind it is not installed.
+    """
+    if not isinstance(name, str):
+        return name
+    if name not in _loaded:
+        _loaded[name] = backend_classes[name]()
+    return _loaded[name]
+
+def available():
+    """
+    Names of the backends that can be loaded here
+    """
+    names = []
+    for name in backend_classes:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return sorted(names)
+
+def benchmark(n=100, nsteps=1000, names=None, g=1.):
+    """
+    Run every backend for nsteps on the same n x n droplet.
+
+    Returns {name: (first call time [s], steps per second, max |eta - eta
+    numpy|)}; the first call includes compilation (or loading the cached
+    kernel).
+    """
+    x, y = np.mgrid[:n, :n]
+    eta = np.ones((n, n))
+    eta[(x - n / 2) ** 2 + (y - n / 2) ** 2 < (n / 10) ** 2] = 1.1
+    u = np.zeros((n, n))
+    v = np.zeros((n, n))
+    h = 1.0 / n
+    dt = h / 100.
+
+    names = available() if names is None else names
+    reference = None
+    results = {}
+    for name in ['numpy'] + [k for k in names if k != 'numpy']:
+        backend = get_backend(name)
+        t0 = _time.time()
+        backend.run(eta, u, v, g, dt, h, 1)
+        first = _time.time() - t0
+        t0 = _time.time()
+        out = backend.run(eta, u, v, g, dt, h, nsteps)
+        rate = nsteps / (_time.time() - t0)
+        if reference is None:
+            reference = out[0]
+        results[name] = (first, rate, np.abs(out[0] - reference).max())
+    return results
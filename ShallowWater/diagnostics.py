@@ -0,0 +1,169 @@
+"""
+Conservation and stability diagnostics for the shallow water solvers.
+
+Every `every` steps the hook computes the total mass, the total energy, the
+Courant number and whether the state is still finite.
+The mass and energy reductions are fused (einsum / dot over the flat
+arrays, no temporaries) and a NaN or inf anywhere in the state shows up in
+those sums, so detection costs nothing extra.  Records go to a fixed size ring buffer.
+
+With abort=True the hook raises SimulationDiverged as soon as the state is
+no longer finite, the Courant number exceeds max_courant or the mass or
+energy drift (relative to the first record) exceeds its limit, so a long
+unattended run stops at the first sign of trouble.
+
+>>> diag = Diagnostics(every=50, g=1., max_mass_drift=1e-10)
+>>> sw = ShallowWater2D(eta_start, u_start, v_start)
+>>> sw.run(100000, diagnostics=diag)
+>>> diag.history['energy']
+
+or around any (eta, u, v, time) generator:
+
+>>> trajectory = diag.monitor(evolveEuler(eta, u, v, g), dt, grid_spacing)
+"""
+
+import numpy as np
+
+record_dtype = np.dtype([('step', np.int64), ('time', np.float64),
+                         ('mass', np.float64), ('energy', np.float64),
+                         ('courant', np.float64), ('finite', np.bool_)])
+
+
+class SimulationDiverged(RuntimeError):
+    """
+    Raised by Diagnostics when a run breaks one of its limits; record holds
+    the offending diagnostics
+    """
+
+    def __init__(self, message, record):
+        RuntimeError.__init__(self, message)
+        self.record = record
+
+
+def _flat(a):
+    return np.ascontiguousarray(a).reshape(-1)
+
+def measure(eta, u, v=None, g=1., dt=1., grid_spacing=1.):
+    """
+    Mass, energy and Courant number of the state (eta, u, v), eta
+    being the total depth.  v=None for 1-D states.  Returns (mass, energy,
+    courant).
+    """
+    e = _flat(eta)
+    uu = _flat(u)
+    area = grid_spacing ** (1 if v is None else 2)
+    mass = e.sum() * area
+    # kinetic 1/2 eta (u^2 + v^2), potential 1/2 g eta^2
+    energy = .5 * np.einsum('i,i,i->', e, uu, uu) + .5 * g * np.dot(e, e)
+    # fastest signal, max over the cells of |u| + sqrt(g eta) (and |v| + ...)
+    c = np.sqrt(g * np.abs(e))
+    speed = (np.abs(uu) + c).max()
+    if v is not None:
+        vv = _flat(v)
+        energy += .5 * np.einsum('i,i,i->', e, vv, vv)
+        speed = max(speed, (np.abs(vv) + c).max())
+    return mass, energy * area, speed * dt / grid_spacing
+
+
+class Diagnostics(object):
+    """
+    Diagnostics hook: call it every step with (step, time, eta, u, v), it
+    measures every `every` steps.
+
+    size             : ring buffer length
+    max_courant      : abort above this Courant number (None: no check);
+                       the solvers step at about 1, the default leaves
+                       room for the growth within a step
+    max_mass_drift   : abort above this relative mass change
+    max_energy_drift : abort above this relative energy change
+    abort            : raise SimulationDiverged, otherwise only flag it in
+                       self.diverged
+    """
+
+    def __init__(self, every=10, size=1024, g=1., dt=1., grid_spacing=1.,
+                 max_courant=1.5, max_mass_drift=None,
+                 max_energy_drift=None, abort=True):
+        self.every = every
+        self.g = g
+        self.dt = dt
+        self.grid_spacing = grid_spacing
+        self.max_courant = max_courant
+        self.max_mass_drift = max_mass_drift
+        self.max_energy_drift = max_energy_drift
+        self.abort = abort
+        self._buffer = np.zeros(size, dtype=record_dtype)
+        self._count = 0
+        self.reference = None
+        self.diverged = None
+
+    def __len__(self):
+        return min(self._count, self._buffer.size)
+
+    @property
+    def history(self):
+        """
+        Stored records, oldest first
+        """
+        n = self._buffer.size
+        if self._count <= n:
+            return self._buffer[:self._count].copy()
+        i = self._count % n
+        return np.concatenate((self._buffer[i:], self._buffer[:i]))
+
+    @property
+    def last(self):
+        return self._buffer[(self._count - 1) % self._buffer.size] \
+            if self._count else None
+
+    def __call__(self, step, time, eta, u, v=None, dt=None, grid_spacing=None):
+        if step % self.every:
+            return None
+        return self.check(step, time, eta, u, v, dt, grid_spacing)
+
+    def check(self, step, time, eta, u, v=None, dt=None, grid_spacing=None):
+        """
+        Measure the state now, store the record and apply the limits
+        """
+        dt = self.dt if dt is None else dt
+        h = self.grid_spacing if grid_spacing is None else grid_spacing
+        mass, energy, courant = measure(eta, u, v, self.g, dt, h)
+
+        rec = self._buffer[self._count % self._buffer.size]
+        rec['step'], rec['time'] = step, time
+        rec['mass'], rec['energy'], rec['courant'] = mass, energy, courant
+        rec['finite'] = np.isfinite(mass) and np.isfinite(energy)
+        self._count += 1
+        if self.reference is None and rec['finite']:
+            self.reference = rec.copy()
+
+        problem = self._problem(rec)
+        if problem is not None:
+            self.diverged = (problem, rec.copy())
+            if self.abort:
+                raise SimulationDiverged('step %d, time %g: %s'
+                                         % (step, time, problem), rec.copy())
+        return rec
+
+    def _problem(self, rec):
+        if not rec['finite']:
+            return 'state is not finite'
+        if self.max_courant is not None and rec['courant'] > self.max_courant:
+            return 'Courant number %.3g > %.3g' % (rec['courant'],
+                                                   self.max_courant)
+        ref = self.reference
+        for name, limit in (('mass', self.max_mass_drift),
+                            ('energy', self.max_energy_drift)):
+            if limit is None or ref[name] == 0:
+                continue
+            drift = abs(rec[name] / ref[name] - 1.)
+            if drift > limit:
+                return '%s drift %.3g > %.3g' % (name, drift, limit)
+        return None
+
+    def monitor(self, trajectory, dt=None, grid_spacing=None):
+        """
+        Wrap a (eta, u, v, time) generator, checking every every-th state
+        """
+        for step, (eta, u, v, time) in enumerate(trajectory):
+            self(step, time, eta, u, v, dt, grid_spacing)
+            yield eta, u, v, time
@@ -0,0 +1,146 @@
+"""
+Ensembles of shallow water runs stepped as one batch.
+
+The state arrays carry a leading ensemble axis, eta[m] being member m, and
+the gravity g and friction b may differ per member.  The slice stencils of
+shallowwater_fast work on the last two axes, so one call differentiates the
+whole ensemble and the Python overhead of a step is paid once for all the
+members instead of once per evolveEuler generator.
+
+>>> eta, u, v = droplets(100, positions=[(30, 50), (50, 50), (70, 50)],
+...                      amplitudes=[.1, .2, .1])
+>>> ens = EnsembleShallowWater2D(eta, u, v, g=1., b=[0., .1, .2])
+>>> ens.run(1000)
+>>> ens.diagnostics()['energy']
+"""
+
+import numpy as np
+
+from shallowwater_fast import ShallowWater2D, d_dx, d_dy
+
+def droplets(n, positions, amplitudes=.1, radius=10, depth=1.):
+    """
+    Ensemble initial conditions: still water of the given depth with a
+    circular droplet of amplitude and radius (in cells) at each (x, y)
+    position.  amplitudes and radius may be scalars or per member.
+    Returns eta, u, v of shape (members, n, n).
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    m = positions.shape[0]
+    amplitudes = np.broadcast_to(np.asarray(amplitudes, dtype=float), (m,))
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), (m,))
+
+    x, y = np.mgrid[:n, :n]
+    rr = (x[None] - positions[:, 0, None, None]) ** 2 + \
+         (y[None] - positions[:, 1, None, None]) ** 2
+    eta = np.full((m, n, n), depth)
+    eta += np.where(rr < radius[:, None, None] ** 2,
+                    amplitudes[:, None, None], 0.)
+    return eta, np.zeros((m, n, n)), np.zeros((m, n, n))
+
+
+class EnsembleShallowWater2D(ShallowWater2D):
+    """
+    ShallowWater2D on (members, n, n) arrays with per-member g and b
+    (scalars or sequences of length members).  step, run, evolve and state
+    are those of ShallowWater2D and act on the whole ensemble.
+    """
+
+    def __init__(self, eta, u, v, g=1., b=0., dt=None, grid_spacing=None,
+                 dtype=np.float64, block=None):
+        ShallowWater2D.__init__(self, eta, u, v, dt=dt,
+                                grid_spacing=grid_spacing, dtype=dtype)
+        if self.eta.ndim != 3:
+            raise ValueError("Ensemble state must be (members, n, n).")
+        m = self.eta.shape[0]
+        self.members = m
+        self.g = np.broadcast_to(np.asarray(g, dtype=self.dtype), (m,))
+        self.b = np.broadcast_to(np.asarray(b, dtype=self.dtype), (m,))
+        self._g = self.g.reshape(m, 1, 1)
+        self._b = self.b.reshape(m, 1, 1)
+        self._friction = bool(np.any(self.b))
+        # members stepped together so the working set of a block (8 arrays)
+        # stays in cache; large grids gain from small blocks
+        if block is None:
+            block = max(1, (1 << 21) // (8 * self.eta[0].nbytes))
+        self.block = min(block, m)
+
+    def d_dt(self, eta=None, u=None, v=None, factor=1.):
+        """
+        Tendencies of the whole ensemble, see ShallowWater2D.d_dt
+        """
+        eta = self.eta if eta is None else eta
+        u = self.u if u is None else u
+        v = self.v if v is None else v
+        for k in range(0, self.members, self.block):
+            sl = slice(k, k + self.block)
+            self._d_dt_block(sl, eta[sl], u[sl], v[sl], factor)
+        return self.deta_dt, self.du_dt, self.dv_dt
+
+    def _d_dt_block(self, sl, eta, u, v, factor):
+        deta_dt, du_dt, dv_dt = self.deta_dt[sl], self.du_dt[sl], self.dv_dt[sl]
+        flux, tmp = self._flux[sl], self._tmp[sl]
+        c = factor / (2. * self.grid_spacing)
+
+        # du/dt = -g d(eta)/dx - b u ; dv/dt = -g d(eta)/dy - b v
+        d_dx(eta, du_dt, -c)
+        du_dt *= self._g[sl]
+        d_dy(eta, dv_dt, -c)
+        dv_dt *= self._g[sl]
+        if self._friction:
+            np.multiply(u, self._b[sl] * factor, out=tmp)
+            du_dt -= tmp
+            np.multiply(v, self._b[sl] * factor, out=tmp)
+            dv_dt -= tmp
+
+        # deta/dt = -d(u eta)/dx - d(v eta)/dy
+        np.multiply(u, eta, out=flux)
+        d_dx(flux, deta_dt, -c)
+        np.multiply(v, eta, out=flux)
+        d_dy(flux, tmp, -c)
+        deta_dt += tmp
+
+    def step(self):
+        """
+        One Euler step of duration dt for all the members, block by block
+        so each block is updated while it is still in cache
+        """
+        for k in range(0, self.members, self.block):
+            sl = slice(k, k + self.block)
+            self._d_dt_block(sl, self.eta[sl], self.u[sl], self.v[sl], self.dt)
+            self.eta[sl] += self.deta_dt[sl]
+            self.u[sl] += self.du_dt[sl]
+            self.v[sl] += self.dv_dt[sl]
+        self.time += self.dt
+
+    def diagnostics(self):
+        """
+        Per-member arrays: mass (integral of eta), energy (kinetic +
+        potential), max |eta - mean eta|, max Courant number and whether the
+        state is still finite
+        """
+        area = self.grid_spacing ** 2
+        axes = (1, 2)
+        mass = self.eta.sum(axis=axes) * area
+        np.multiply(self.u, self.u, out=self._tmp)
+        self._tmp += self.v * self.v
+        self._tmp *= self.eta
+        kinetic = .5 * self._tmp.sum(axis=axes)
+        potential = .5 * self.g * np.einsum('mij,mij->m', self.eta, self.eta)
+        mean = mass / (area * self.eta.shape[1] * self.eta.shape[2])
+        amplitude = np.abs(self.eta - mean[:, None, None]).max(axis=axes)
+        c = np.sqrt(self._g * np.abs(self.eta))
+        speed = np.maximum((np.abs(self.u) + c).max(axis=axes),
+                           (np.abs(self.v) + c).max(axis=axes))
+        return {'time': self.time,
+                'mass': mass,
+                'energy': (kinetic + potential) * area,
+                'amplitude': amplitude,
+                'courant': speed * self.dt / self.grid_spacing,
+                'finite': np.isfinite(mass) & np.isfinite(kinetic)}
+
+    def member(self, k):
+        """
+        Views of the state of member k
+        """
+        return self.eta[k], self.u[k], self.v[k]
@@ -0,0 +1,155 @@
+"""
+Time integrators for the shallow water right-hand sides.
+
+Forward Euler with balanced (central) differences is unconditionally
+unstable, which is why evolveEuler needs dt = grid_spacing/100.  The schemes
+below are stable up to a Courant number of order one, and the time step can
+follow the CFL condition of the current state:
+
+    dt = cfl * grid_spacing / max(|u| + sqrt(g*eta), |v| + sqrt(g*eta))
+
+Any right-hand side with the signature of d_dt works:
+
+    rhs(eta, u, v, g) -> (deta_dt, du_dt, dv_dt)
+
+e.g. shallowwater_base.d_dt or shallowwater_simple.d_dt_conservative.
+
+>>> trajectory = evolve(eta, u, v, g, d_dt, method='ssprk3', cfl=0.5)
+>>> eta, u, v, time = trajectory.next()
+"""
+
+import numpy as np
+
+methods = ['euler', 'ssprk3', 'rk4', 'forward_backward', 'leapfrog']
+
+def cfl_dt(eta, u, v, g, grid_spacing, cfl=0.5):
+    """
+    Largest time step allowed by the Courant number cfl
+    """
+    c = np.sqrt(g * np.abs(eta))
+    speed = max(np.max(np.abs(u) + c), np.max(np.abs(v) + c))
+    if speed == 0:
+        return np.inf
+    return cfl * grid_spacing / speed
+
+def _axpy(a, xs, ys):
+    # a*x + y for the three state arrays
+    return tuple(a * x + y for x, y in zip(xs, ys))
+
+def euler_step(state, g, dt, rhs):
+    return _axpy(dt, rhs(*(state + (g,))), state)
+
+def ssprk3_step(state, g, dt, rhs):
+    """
+    Strong stability preserving Runge-Kutta, 3 stages (Shu & Osher)
+    """
+    y1 = _axpy(dt, rhs(*(state + (g,))), state)
+    y2 = _axpy(dt, rhs(*(y1 + (g,))), y1)
+    y2 = tuple(0.75 * a + 0.25 * b for a, b in zip(state, y2))
+    y3 = _axpy(dt, rhs(*(y2 + (g,))), y2)
+    return tuple(a / 3. + 2. / 3. * b for a, b in zip(state, y3))
+
+def rk4_step(state, g, dt, rhs):
+    """
+    Classical 4th order Runge-Kutta
+    """
+    k1 = rhs(*(state + (g,)))
+    k2 = rhs(*(_axpy(dt / 2., k1, state) + (g,)))
+    k3 = rhs(*(_axpy(dt / 2., k2, state) + (g,)))
+    k4 = rhs(*(_axpy(dt, k3, state) + (g,)))
+    return tuple(y + dt / 6. * (a + 2 * b + 2 * c + d)
+                 for y, a, b, c, d in zip(state, k1, k2, k3, k4))
+
+def forward_backward_step(state, g, dt, rhs):
+    """
+    Velocities forward with the old eta, then eta with the new velocities
+    """
+    eta, u, v = state
+    _, du_dt, dv_dt = rhs(eta, u, v, g)
+    u = u + dt * du_dt
+    v = v + dt * dv_dt
+    deta_dt = rhs(eta, u, v, g)[0]
+    return eta + dt * deta_dt, u, v
+
+steppers = {'euler': euler_step,
+            'ssprk3': ssprk3_step,
+            'rk3': ssprk3_step,
+            'rk4': rk4_step,
+            'forward_backward': forward_backward_step}
+
+def evolve(eta, u, v, g, rhs, method='ssprk3', cfl=0.5, dt=None,
+           grid_spacing=None, asselin=0.1):
+    """
+    Evolve state (eta, u, v, g) forward in time with the chosen method
+
+    method       : 'euler', 'ssprk3' (or 'rk3'), 'rk4', 'forward_backward'
+                   or 'leapfrog'
+    dt           : fixed time step; when None it is recomputed every step
+                   from the Courant number cfl (leapfrog keeps the first
+                   one, it needs a constant step)
+    grid_spacing : defaults to a unit box, 1./n
+    asselin      : Robert-Asselin filter coefficient for leapfrog
+
+    Returns an generator / infinite list of all states in the evolution,
+    like evolveEuler
+    """
+    if grid_spacing is None:
+        grid_spacing = 1.0 / eta.shape[-1]
+
+    state = (eta, u, v)
+    time = 0
+    yield eta, u, v, time
+
+    if method == 'leapfrog':
+        step_dt = dt if dt is not None else cfl_dt(eta, u, v, g, grid_spacing, cfl)
+        previous = state
+        state = rk4_step(state, g, step_dt, rhs)
+        time += step_dt
+        yield state + (time,)
+        while(True):
+            tend = rhs(*(state + (g,)))
+            new = _axpy(2 * step_dt, tend, previous)
+            # Robert-Asselin filter on the middle level damps the computational mode
+            filtered = tuple(c + asselin * (p - 2 * c + n)
+                             for p, c, n in zip(previous, state, new))
+            previous, state = filtered, new
+            time += step_dt
+            yield state + (time,)
+
+    stepper = steppers[method]
+    while(True):
+        step_dt = dt if dt is not None else cfl_dt(state[0], state[1], state[2],
+                                                  g, grid_spacing, cfl)
+        state = stepper(state, g, step_dt, rhs)
+        time += step_dt
+        yield state + (time,)
+
+def integrate(eta, u, v, g, rhs, endTime, method='ssprk3', cfl=0.5, dt=None,
+              grid_spacing=None):
+    """
+    Run evolve up to endTime (the last step is shortened to land on it).
+    Returns eta, u, v and the number of steps taken.
+    """
+    if grid_spacing is None:
+        grid_spacing = 1.0 / eta.shape[-1]
+    if method == 'leapfrog':
+        step_dt = dt if dt is not None else cfl_dt(eta, u, v, g, grid_spacing, cfl)
+        nsteps = int(np.ceil(endTime / step_dt))
+        trajectory = evolve(eta, u, v, g, rhs, method, dt=endTime / nsteps,
+                            grid_spacing=grid_spacing)
+        for _ in range(nsteps + 1):
+            eta, u, v, time = next(trajectory)
+        return eta, u, v, nsteps
+
+    state = (eta, u, v)
+    stepper = steppers[method]
+    time = 0.
+    nsteps = 0
+    while time < endTime:
+        step_dt = dt if dt is not None else cfl_dt(state[0], state[1], state[2],
+                                                  g, grid_spacing, cfl)
+        step_dt = min(step_dt, endTime - time)
+        state = stepper(state, g, step_dt, rhs)
+        time += step_dt
+        nsteps += 1
+    return state + (nsteps,)
@@ -0,0 +1,218 @@
+"""
+Relaxation solvers for the Laplace / Poisson problem  lap(U) = f.
+
+The sweeps of Shallow_water_RungeKutta gather the four neighbours with index
+arrays (U[n, :], U[:, e], ...), which copies the whole grid four times per
+sweep.  Here the neighbours are slices of one work array: with
+boundary='neumann' (the clamped indices of the original) the grid is padded
+with a ghost ring refreshed from the edge values, with boundary='dirichlet'
+the edge values are held fixed and only the interior is relaxed.
+
+method :
+    'jacobi'    weighted Jacobi, omega=1 is the original relaxation
+    'sor'       red-black successive over-relaxation, by default with the
+                optimal omega = 2 / (1 + sin(pi / m)) of the m x m grid
+    'multigrid' V-cycles with red-black Gauss-Seidel smoothing (dirichlet,
+                grids of 2**k + 1 points)
+
+Iterations stop once the largest change of a sweep (the residual for
+multigrid) falls below tol, or after maxiter.  callback(iteration, U) is
+called only on the requested frames, which is where plotting belongs.
+
+>>> U, its, change = relax(U0, method='sor', tol=1e-8)
+>>> relax(U0, frames=[0, 100, 499], callback=draw, tol=0, maxiter=500)
+"""
+
+import numpy as np
+
+_red = ((0, 0), (1, 1))
+_black = ((0, 1), (1, 0))
+
+def optimal_omega(m):
+    """
+    Optimal SOR factor for the 5 point Laplacian on a m x m grid
+    """
+    return 2. / (1. + np.sin(np.pi / max(m, 2)))
+
+
+class Relaxation(object):
+    """
+    In place relaxation of U (a copy is kept in self.U).  sweep() does one
+    iteration and returns the largest change.
+    """
+
+    def __init__(self, U, f=None, grid_spacing=1., method='jacobi',
+                 omega=None, boundary='neumann'):
+        U = np.asarray(U, dtype=np.float64)
+        self.method = method
+        self.boundary = boundary
+        self.grid_spacing = grid_spacing
+        self.iterations = 0
+        if boundary == 'neumann':
+            self._W = np.zeros((U.shape[0] + 2, U.shape[1] + 2))
+            self._W[1:-1, 1:-1] = U
+            self.U = self._W[1:-1, 1:-1]
+            self._fill_ghosts()
+        elif boundary == 'dirichlet':
+            self._W = U.copy()
+            self.U = self._W
+        else:
+            raise ValueError("boundary must be 'neumann' or 'dirichlet'.")
+        # relaxed points and the right hand side on them, times h^2
+        self._A = self._W[1:-1, 1:-1]
+        ni, nj = self._A.shape
+        if f is None:
+            self._hf = None
+        else:
+            f = np.broadcast_to(np.asarray(f, dtype=np.float64), U.shape)
+            self._hf = (f if boundary == 'neumann' else f[1:-1, 1:-1]) \
+                * grid_spacing ** 2
+
+        if omega is None:
+            omega = optimal_omega(max(U.shape) - 1) if method == 'sor' else 1.
+        self.omega = omega
+        if method == 'multigrid':
+            if boundary != 'dirichlet':
+                raise ValueError("Multigrid needs dirichlet boundaries.")
+            if any(((s - 1) & (s - 2)) or s < 3 for s in U.shape):
+                raise ValueError("Multigrid needs 2**k + 1 points per side.")
+            if self._hf is None:
+                self._hf = np.zeros((ni, nj))
+        elif method not in ('jacobi', 'sor'):
+            raise ValueError("Unknown method %s." % method)
+        self._new = np.empty((ni, nj))
+        self._sum = np.empty((ni, nj))
+
+    def _fill_ghosts(self):
+        if self.boundary == 'neumann':
+            W = self._W
+            W[0, 1:-1] = W[1, 1:-1]
+            W[-1, 1:-1] = W[-2, 1:-1]
+            W[:, 0] = W[:, 1]
+            W[:, -1] = W[:, -2]
+
+    def sweep(self):
+        if self.method == 'jacobi':
+            change = self._jacobi()
+        elif self.method == 'sor':
+            change = self._sor()
+        else:
+            change = self._vcycle()
+        self.iterations += 1
+        return change
+
+    def _jacobi(self):
+        W, A, s = self._W, self._A, self._sum
+        np.add(W[2:, 1:-1], W[:-2, 1:-1], out=s)
+        s += W[1:-1, 2:]
+        s += W[1:-1, :-2]
+        if self._hf is not None:
+            s -= self._hf
+        s *= self.omega / 4.
+        np.multiply(A, 1. - self.omega, out=self._new)
+        self._new += s
+        np.subtract(self._new, A, out=s)
+        change = np.abs(s).max()
+        A[...] = self._new
+        self._fill_ghosts()
+        return change
+
+    def _sor(self):
+        change = 0.
+        for color in (_red, _black):
+            change = max(change, _gauss_seidel(self._W, self._hf, self.omega,
+                                               color))
+            self._fill_ghosts()
+        return change
+
+    def _vcycle(self):
+        _vcycle(self._W, np.pad(self._hf, 1, 'constant'))
+        return np.abs(_residual(self._W, self._hf)).max() / \
+            self.grid_spacing ** 2
+
+    def run(self, tol=1e-6, maxiter=10000, frames=None, callback=None):
+        """
+        Sweep until the change drops below tol (or maxiter sweeps), calling
+        callback(iteration, U) on the iterations listed in frames.
+        Returns U, the number of sweeps and the last change.
+        """
+        frames = set() if frames is None else set(frames)
+        change = np.inf
+        if callback is not None and 0 in frames:
+            callback(0, self.U)
+        while self.iterations < maxiter:
+            change = self.sweep()
+            if callback is not None and self.iterations in frames:
+                callback(self.iterations, self.U)
+            if change < tol:
+                break
+        return self.U, self.iterations, change
+
+
+def _gauss_seidel(W, hf, omega, color):
+    # relax the points of one color of the interior of W in place
+    ni, nj = W.shape[0] - 2, W.shape[1] - 2
+    change = 0.
+    for r0, c0 in color:
+        if r0 >= ni or c0 >= nj:
+            continue
+        centre = W[r0 + 1:ni + 1:2, c0 + 1:nj + 1:2]
+        s = W[r0 + 2:ni + 2:2, c0 + 1:nj + 1:2] + W[r0:ni:2, c0 + 1:nj + 1:2]
+        s += W[r0 + 1:ni + 1:2, c0 + 2:nj + 2:2]
+        s += W[r0 + 1:ni + 1:2, c0:nj:2]
+        if hf is not None:
+            s -= hf[r0::2, c0::2]
+        s *= omega / 4.
+        s -= omega * centre
+        change = max(change, np.abs(s).max())
+        centre += s
+    return change
+
+def _residual(W, hf):
+    # h^2 (lap(W) - f) on the interior
+    r = 4. * W[1:-1, 1:-1] - W[2:, 1:-1] - W[:-2, 1:-1] - W[1:-1, 2:] \
+        - W[1:-1, :-2]
+    r += hf
+    return -r
+
+def _vcycle(W, HF, nu=2):
+    # one V-cycle on W (dirichlet edges) for the padded h^2 f array HF
+    hf = HF[1:-1, 1:-1]
+    for _ in range(nu):
+        _gauss_seidel(W, hf, 1., _red)
+        _gauss_seidel(W, hf, 1., _black)
+    if W.shape[0] <= 3 or W.shape[1] <= 3:
+        return
+    r = np.zeros_like(W)
+    r[1:-1, 1:-1] = _residual(W, hf)
+    # full weighting restriction, the coarse h^2 is 4 times larger
+    rc = r[::2, ::2].copy()
+    rc[1:-1, 1:-1] = (4. * r[2:-2:2, 2:-2:2]
+                      + 2. * (r[1:-3:2, 2:-2:2] + r[3:-1:2, 2:-2:2]
+                              + r[2:-2:2, 1:-3:2] + r[2:-2:2, 3:-1:2])
+                      + r[1:-3:2, 1:-3:2] + r[1:-3:2, 3:-1:2]
+                      + r[3:-1:2, 1:-3:2] + r[3:-1:2, 3:-1:2]) / 16.
+    rc[0], rc[-1], rc[:, 0], rc[:, -1] = 0., 0., 0., 0.
+    # coarse error equation lap(e) = -r / h^2
+    E = np.zeros_like(rc)
+    _vcycle(E, -4. * rc, nu)
+    # bilinear prolongation
+    e = np.zeros_like(W)
+    e[::2, ::2] = E
+    e[1::2, ::2] = .5 * (E[:-1] + E[1:])
+    e[::2, 1::2] = .5 * (E[:, :-1] + E[:, 1:])
+    e[1::2, 1::2] = .25 * (E[:-1, :-1] + E[1:, :-1] + E[:-1, 1:] + E[1:, 1:])
+    W[1:-1, 1:-1] += e[1:-1, 1:-1]
+    for _ in range(nu):
+        _gauss_seidel(W, hf, 1., _red)
+        _gauss_seidel(W, hf, 1., _black)
+
+def relax(U, f=None, grid_spacing=1., method='jacobi', omega=None,
+          boundary='neumann', tol=1e-6, maxiter=10000, frames=None,
+          callback=None):
+    """
+    Relax U towards lap(U) = f, see the module doc.  Returns the relaxed
+    array, the number of iterations and the last change.
+    """
+    r = Relaxation(U, f, grid_spacing, method, omega, boundary)
+    return r.run(tol, maxiter, frames, callback)
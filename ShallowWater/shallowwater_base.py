@@ -1,5 +1,8 @@
 import numpy as np
-import theano.tensor as T
+try:
+    import theano.tensor as T
+except ImportError:
+    T = None
 from pylab import figure, imshow, title, colorbar
 
 # Initial Conditions
@@ -30,7 +33,7 @@ def roll(x, shift, axis):
     """
     if isinstance(x, np.ndarray):
         return np.roll(x, shift, axis)
-    if isinstance(x, T.basic.TensorVariable):
+    if T is not None and isinstance(x, T.basic.TensorVariable):
         return T.roll(x, shift, axis)
     raise NotImplementedError()
 
@@ -67,13 +70,21 @@ def d_dt(eta, u, v, g, b=0):
 
     return deta_dt, du_dt, dv_dt
 
-def step(eta, u, v, g, dt=dt):
+def step(eta, u, v, g, dt=dt, backend=None):
     """
     Step forward eta, u, v one step in time of duration dt
 
+    backend : 'numpy', 'numba' or 'jax' (see backends.py) runs the step as
+              one compiled kernel on numpy arrays; None keeps the
+              numpy/theano agnostic expression below
+
     See Also:
         d_dt
     """
+    if backend is not None:
+        import backends
+        return backends.get_backend(backend).step(eta, u, v, g, dt, grid_spacing)
+
     deta_dt, du_dt, dv_dt = d_dt(eta, u, v, g)
 
     eta = eta + deta_dt * dt
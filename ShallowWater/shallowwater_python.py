@@ -1,4 +1,5 @@
 from shallowwater_base import *
+import integrators
 
 def evolveEuler(eta, u, v, g, dt=dt):
     """
@@ -21,8 +22,24 @@ def evolveEuler(eta, u, v, g, dt=dt):
 
         yield eta, u, v, time
 
-def demo(eta=eta_start, u=u_start, v=v_start, g=g, dt=dt, endTime=.3):
-    trajectory = evolveEuler(eta, u, v, g, dt)
+def evolveIntegrator(eta, u, v, g, method='ssprk3', cfl=0.5, dt=None, rhs=d_dt):
+    """
+    Evolve state (eta, u, v, g) with a stable integrator of integrators.py
+    ('ssprk3', 'rk4', 'forward_backward' or 'leapfrog').  With dt=None the
+    time step follows the CFL condition, about 100 times fewer steps than
+    evolveEuler.  rhs may also be shallowwater_simple.d_dt_conservative.
+
+    >>> trajectory = evolveIntegrator(eta, u, v, g, method='rk4')
+    >>> eta, u, v, time = trajectory.next()
+    """
+    return integrators.evolve(eta, u, v, g, rhs, method, cfl, dt, grid_spacing)
+
+def demo(eta=eta_start, u=u_start, v=v_start, g=g, dt=dt, endTime=.3,
+         method='euler'):
+    if method == 'euler':
+        trajectory = evolveEuler(eta, u, v, g, dt)
+    else:
+        trajectory = evolveIntegrator(eta, u, v, g, method)
 
     # Figure with initial conditions
     eta, u, v, time = trajectory.next()
@@ -1,7 +1,11 @@
 from pylab import figure, imshow, title, colorbar
-import theano.tensor as T
-import theano
+try:
+    import theano.tensor as T
+    import theano
+except ImportError:
+    theano = None
 from shallowwater_base import *
+import backends
 
 def make2DTensor(name):
     """
@@ -41,11 +45,34 @@ def evolveTime(g, endTime, dt=dt):
 
     return [eta_in, u_in, v_in], [eta_out, u_out, v_out]
 
-def demo(eta=eta_start, u=u_start, v=v_start, g=g, dt=dt, endTime=.3):
+def evolveTimeBackend(g, endTime, dt=dt, backend='numba'):
+    """
+    Same as theano.function(*evolveTime(g, endTime, dt)) on a compiled
+    kernel backend of backends.py, without the scan graph: the kernel is
+    compiled once (and cached on disk by numba) whatever the number of steps
+
+    >>> f = evolveTimeBackend(1, .3)
+    >>> eta_end, u_end, v_end = f(eta_start, u_start, v_start)
+    """
+    numsteps = int(endTime/dt)
+    kernels = backends.get_backend(backend)
+
+    def f(eta, u, v):
+        return kernels.run(eta, u, v, g, dt, grid_spacing, numsteps)
+    return f
+
+def demo(eta=eta_start, u=u_start, v=v_start, g=g, dt=dt, endTime=.3,
+         backend=None):
 
     # Create time evolution function
-    inputs, outputs = evolveTime(1, endTime, dt)
-    f = theano.function(inputs, outputs)
+    if backend is None and theano is not None:
+        inputs, outputs = evolveTime(1, endTime, dt)
+        f = theano.function(inputs, outputs)
+    else:
+        if backend is None:
+            # numba when it is installed, otherwise plain numpy
+            backend = 'numba' if 'numba' in backends.available() else 'numpy'
+        f = evolveTimeBackend(1, endTime, dt, backend)
 
     # Figure with initial conditions
     figure(); title('Initial conditions')
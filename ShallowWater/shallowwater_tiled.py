@@ -0,0 +1,205 @@
+"""
+Domain decomposed version of the shallowwater_fast solver.
+
+The grid is split in horizontal strips which are stepped concurrently on a
+thread pool.  The state lives in shared arrays padded with one ghost row
+above and below; the halo exchange before each step is the copy of the
+periodic rows into the ghost rows, after which every strip reads the rows
+it needs (its own plus one on each side) as views of the shared arrays.
+New values go to a second set of arrays, which are swapped with the first
+once all strips are done, so no strip ever sees a half updated neighbour.
+
+NumPy releases the GIL inside its ufunc loops, so the strips do run in
+parallel; when numexpr is installed the final update of each strip is one
+fused kernel instead of a sequence of ufunc passes.
+
+>>> sw = TiledShallowWater2D(eta_start, u_start, v_start, nthreads=8)
+>>> sw.run(1000)
+>>> imshow(sw.eta)
+"""
+
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+from shallowwater_fast import d_dx
+
+
+class _Strip(object):
+    """
+    Rows [r0, r1) of the grid with their private tendency buffers
+    """
+
+    def __init__(self, r0, r1, nx, dtype):
+        self.r0, self.r1 = r0, r1
+        h = r1 - r0
+        self.deta = np.empty((h, nx), dtype=dtype)
+        self.du = np.empty((h, nx), dtype=dtype)
+        self.dv = np.empty((h, nx), dtype=dtype)
+        self.flux = np.empty((h + 2, nx), dtype=dtype)
+        self.tmp = np.empty((h, nx), dtype=dtype)
+
+
+class TiledShallowWater2D(object):
+    """
+    Shallow water equations (non-conservative form, periodic box) stepped
+    with Euler's method, strip by strip on nthreads threads.
+
+    Same equations and results as shallowwater_fast.ShallowWater2D.
+    nstrips defaults to nthreads, nthreads to the number of cores.
+    """
+
+    def __init__(self, eta, u, v, g=1., b=0., dt=None, grid_spacing=None,
+                 dtype=np.float64, nthreads=None, nstrips=None):
+        ny, nx = eta.shape[-2:]
+        self.dtype = np.dtype(dtype)
+        self.g = g
+        self.b = b
+        self.grid_spacing = 1.0 / nx if grid_spacing is None else grid_spacing
+        self.dt = self.grid_spacing / 100. if dt is None else dt
+        self.time = 0.
+        self.nthreads = cpu_count() if nthreads is None else nthreads
+        nstrips = self.nthreads if nstrips is None else nstrips
+        nstrips = max(1, min(nstrips, ny))
+
+        # shared state with one ghost row on each side, current and next
+        self._cur = [np.zeros((ny + 2, nx), dtype=self.dtype) for _ in range(3)]
+        self._new = [np.zeros((ny + 2, nx), dtype=self.dtype) for _ in range(3)]
+        for arr, init in zip(self._cur, (eta, u, v)):
+            arr[1:-1] = init
+
+        edges = np.linspace(0, ny, nstrips + 1).astype(int)
+        self.strips = [_Strip(r0, r1, nx, self.dtype)
+                       for r0, r1 in zip(edges[:-1], edges[1:]) if r1 > r0]
+        self._pool = ThreadPool(self.nthreads) if self.nthreads > 1 else None
+
+    @property
+    def eta(self):
+        return self._cur[0][1:-1]
+
+    @property
+    def u(self):
+        return self._cur[1][1:-1]
+
+    @property
+    def v(self):
+        return self._cur[2][1:-1]
+
+    @property
+    def state(self):
+        return self.eta, self.u, self.v
+
+    def exchange_halos(self):
+        """
+        Fill the ghost rows with the periodic neighbours
+        """
+        for arr in self._cur:
+            arr[0] = arr[-2]
+            arr[-1] = arr[1]
+
+    def _step_strip(self, s):
+        E, U, V = [arr[s.r0:s.r1 + 2] for arr in self._cur]
+        nE, nU, nV = [arr[s.r0 + 1:s.r1 + 1] for arr in self._new]
+        c = self.dt / (2. * self.grid_spacing)
+        e, uu, vv = E[1:-1], U[1:-1], V[1:-1]
+
+        # du = -g d(eta)/dx - b u ; dv = -g d(eta)/dy - b v   (times dt)
+        d_dx(e, s.du, -self.g * c)
+        np.subtract(E[2:], E[:-2], out=s.dv)
+        s.dv *= -self.g * c
+
+        # deta = -d(u eta)/dx - d(v eta)/dy
+        fx = s.flux[1:-1]
+        np.multiply(uu, e, out=fx)
+        d_dx(fx, s.deta, -c)
+        np.multiply(V, E, out=s.flux)
+        np.subtract(s.flux[2:], s.flux[:-2], out=s.tmp)
+
+        if ne is not None:
+            bdt = self.b * self.dt
+            deta, tmp, du, dv = s.deta, s.tmp, s.du, s.dv
+            ne.evaluate("e + deta - c * tmp", out=nE)
+            ne.evaluate("uu + du - bdt * uu", out=nU)
+            ne.evaluate("vv + dv - bdt * vv", out=nV)
+            return
+
+        s.tmp *= -c
+        s.deta += s.tmp
+        np.add(e, s.deta, out=nE)
+        np.add(uu, s.du, out=nU)
+        np.add(vv, s.dv, out=nV)
+        if self.b:
+            np.multiply(uu, self.b * self.dt, out=s.tmp)
+            nU -= s.tmp
+            np.multiply(vv, self.b * self.dt, out=s.tmp)
+            nV -= s.tmp
+
+    def step(self):
+        """
+        One Euler step of duration dt on all the strips
+        """
+        self.exchange_halos()
+        if self._pool is None or len(self.strips) == 1:
+            for s in self.strips:
+                self._step_strip(s)
+        else:
+            self._pool.map(self._step_strip, self.strips)
+        self._cur, self._new = self._new, self._cur
+        self.time += self.dt
+
+    def run(self, nsteps, diagnostics=None):
+        """
+        nsteps steps; diagnostics is an optional diagnostics.Diagnostics
+        hook called after every step
+        """
+        for i in range(nsteps):
+            self.step()
+            if diagnostics is not None:
+                diagnostics(i + 1, self.time, self.eta, self.u, self.v,
+                            self.dt, self.grid_spacing)
+        return self.state
+
+    def evolve(self):
+        """
+        Generator of (eta, u, v, time) like evolveEuler.  The arrays are
+        views of the solver's buffers; copy them to keep a snapshot.
+        """
+        yield self.eta, self.u, self.v, self.time
+        while(True):
+            self.step()
+            yield self.eta, self.u, self.v, self.time
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def scaling(n=2000, nsteps=10, threads=(1, 2, 4, 8, 16, 32), dtype=np.float64):
+    """
+    Steps per second of TiledShallowWater2D on a n x n droplet for each
+    thread count in threads.  Returns a list of (nthreads, rate).
+    """
+    import time as _time
+
+    x, y = np.mgrid[:n, :n]
+    eta = np.ones((n, n))
+    eta[(x - n / 2) ** 2 + (y - n / 2) ** 2 < (n / 10) ** 2] = 1.1
+    u = np.zeros((n, n))
+    v = np.zeros((n, n))
+
+    rates = []
+    for nthreads in threads:
+        sw = TiledShallowWater2D(eta, u, v, dtype=dtype, nthreads=nthreads)
+        sw.step()
+        t0 = _time.time()
+        sw.run(nsteps)
+        rates.append((nthreads, nsteps / (_time.time() - t0)))
+        sw.close()
+    return rates
@@ -0,0 +1,165 @@
+'''
+Created on Oct 19, 2026
+
+Tiled, memory mapped bathymetry rasters.
+
+A DEM is converted once into a raw binary file of square tiles
+(tiles_y, tiles_x, tile, tile) plus a small json header; afterwards it is
+opened as a memory map and every operation walks it tile by tile, so a
+regional DEM much larger than the memory can be masked and summarised.
+
+>>> dem = open_dem(path + '/Fathom_Five_Bathy.mat', 'FF')
+>>> mask_area, H = depth_histogram(dem, vertices)   # histc(Inside2, [50 156 166 175 250])
+'''
+import json
+import os
+
+import numpy as np
+from skimage.draw import polygon
+
+# elevation classes of the Fathom Five park (lake level at 179 m):
+# >20 m depth, 10-20 m depth, 0-10 m depth, land
+depth_edges = [50, 156, 166, 175, 250]
+depth_labels = ['>20m depth', '10-20 m depth', '0-10 depth', 'land']
+
+
+def convert(data, out, tile = 512, fill = np.nan):
+    '''Write the 2D array `data` (any array like, also a memmap) to the tiled
+    file `out` (+ `out`.json), one row of tiles at a time.  Returns the
+    TiledDEM.'''
+    ny, nx = data.shape
+    dtype = np.dtype(getattr(data, 'dtype', np.float64))
+    if np.isnan(fill) and dtype.kind != 'f':
+        dtype = np.dtype(np.float32)
+    nty, ntx = -(-ny // tile), -(-nx // tile)
+    tiles = np.memmap(out,dtype = dtype, mode = 'w+', shape = (nty, ntx, tile, tile))
+    for ty in range(nty):
+        r0, r1 = ty * tile, min(ny, (ty + 1) * tile)
+        band = np.asarray(data[r0:r1], dtype = dtype)
+        for tx in range(ntx):
+            c0, c1 = tx * tile, min(nx, (tx + 1) * tile)
+            t = tiles[ty, tx]
+            t[...] = fill
+            t[:r1 - r0, :c1 - c0] = band[:, c0:c1]
+    tiles.flush()
+    del tiles
+    with open(out + '.json', 'w') as f:
+        json.dump({'shape': [ny, nx], 'tile': tile, 'dtype': dtype.str,
+                   'fill': None if np.isnan(fill) else fill}, f)
+    return TiledDEM(out)
+
+def open_dem(matfile, name, tile = 512, out = None):
+    '''Tiled DEM of the variable `name` of a Matlab file, converted on the
+    first call (to `matfile`.`name`.tiles) and memory mapped afterwards.'''
+    if out is None:
+        out = '%s.%s.tiles' % (os.path.splitext(matfile)[0], name)
+    if not os.path.exists(out + '.json'):
+        import scipy.io
+        convert(scipy.io.loadmat(matfile, variable_names = [name])[name], out, tile)
+    return TiledDEM(out)
+
+
+class TiledDEM(object):
+
+    def __init__(self, path):
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        self.path = path
+        self.shape = tuple(meta['shape'])
+        self.tile = meta['tile']
+        self.dtype = np.dtype(meta['dtype'])
+        self.fill = np.nan if meta['fill'] is None else meta['fill']
+        nty, ntx = -(-self.shape[0] // self.tile), -(-self.shape[1] // self.tile)
+        self.tiles = np.memmap(path, dtype = self.dtype, mode = 'r',
+                               shape = (nty, ntx, self.tile, self.tile))
+
+    def __iter__(self):
+        '''(row0, col0, view) of every tile, cut to the raster extent'''
+        T = self.tile
+        ny, nx = self.shape
+        for ty in range(self.tiles.shape[0]):
+            for tx in range(self.tiles.shape[1]):
+                r0, c0 = ty * T, tx * T
+                yield r0, c0, self.tiles[ty, tx, :min(T, ny - r0), :min(T, nx - c0)]
+
+    def read(self, rows = None, cols = None):
+        '''Window rows=(r0, r1), cols=(c0, c1) as a regular array (the whole
+        raster by default)'''
+        r0, r1 = (0, self.shape[0]) if rows is None else rows
+        c0, c1 = (0, self.shape[1]) if cols is None else cols
+        T = self.tile
+        out = np.empty((r1 - r0, c1 - c0), dtype = self.dtype)
+        for ty in range(r0 // T, -(-r1 // T)):
+            for tx in range(c0 // T, -(-c1 // T)):
+                a0, a1 = max(r0, ty * T), min(r1, (ty + 1) * T)
+                b0, b1 = max(c0, tx * T), min(c1, (tx + 1) * T)
+                out[a0 - r0:a1 - r0, b0 - c0:b1 - c0] = \
+                    self.tiles[ty, tx, a0 - ty * T:a1 - ty * T, b0 - tx * T:b1 - tx * T]
+        return out
+
+    def overview(self, step):
+        '''Every step-th sample in both directions, for plotting'''
+        ny, nx = self.shape
+        out = np.empty((-(-ny // step), -(-nx // step)), dtype = self.dtype)
+        for r0, c0, t in self:
+            # first sample of the tile on the step grid
+            a, b = (-r0) % step, (-c0) % step
+            sub = t[a::step, b::step]
+            out[(r0 + a) // step:(r0 + a) // step + sub.shape[0],
+                (c0 + b) // step:(c0 + b) // step + sub.shape[1]] = sub
+        return out
+
+
+def tile_mask(vertices, r0, c0, shape):
+    '''Boolean mask of the polygon `vertices` [(row, col), ...] over the
+    tile of `shape` whose first cell is (r0, c0)'''
+    poly = np.asarray(vertices, dtype = float)
+    mask = np.zeros(shape, dtype = bool)
+    rr, cc = polygon(poly[:, 0] - r0, poly[:, 1] - c0, shape)
+    mask[rr, cc] = True
+    return mask
+
+def masked_tiles(dem, vertices = None):
+    '''(r0, c0, tile, mask) of the tiles touching the polygon (all the
+    tiles, mask None, without vertices).  Tiles outside the polygon bounding
+    box are skipped without being read.'''
+    if vertices is not None:
+        poly = np.asarray(vertices, dtype = float)
+        rmin, cmin = poly.min(axis = 0)
+        rmax, cmax = poly.max(axis = 0)
+    T = dem.tile
+    for r0, c0, t in dem:
+        if vertices is None:
+            yield r0, c0, t, None
+            continue
+        if r0 > rmax or c0 > cmax or r0 + T <= rmin or c0 + T <= cmin:
+            continue
+        mask = tile_mask(vertices, r0, c0, t.shape)
+        if mask.any():
+            yield r0, c0, t, mask
+
+def depth_histogram(dem, vertices = None, edges = depth_edges):
+    '''Streaming histc: number of cells inside the polygon with
+    edges[k] <= z < edges[k+1] (the last count is z == edges[-1]), and the
+    number of cells in the polygon.'''
+    edges = np.asarray(edges, dtype = float)
+    counts = np.zeros(edges.size, dtype = np.int64)
+    size = 0
+    for r0, c0, t, mask in masked_tiles(dem, vertices):
+        z = t[mask] if mask is not None else np.asarray(t).ravel()
+        z = z[np.isfinite(z)] if z.dtype.kind == 'f' else z
+        size += z.size
+        k = np.searchsorted(edges, z, side = 'right') - 1
+        # histc puts z == edges[-1] in its own last bin
+        k[z == edges[-1]] = edges.size - 1
+        valid = (k >= 0) & (z <= edges[-1])
+        counts += np.bincount(k[valid], minlength = edges.size)
+    return size, counts
+
+def masked_array(dem, vertices, rows = None, cols = None):
+    '''Window of the DEM as a masked array, masked outside the polygon'''
+    r0, r1 = (0, dem.shape[0]) if rows is None else rows
+    c0, c1 = (0, dem.shape[1]) if cols is None else cols
+    data = dem.read((r0, r1), (c0, c1))
+    mask = tile_mask(vertices, r0, c0, data.shape)
+    return np.ma.masked_array(data, mask = ~mask)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+#
+# bands.py
+#
+# purpose:  Frequency band indexing shared by the spectral methods.
+# created:  19-Oct-2026
+#
+# obs:  MTM (mtm.py, multitaper.py), Lomb (lomb_periodogram.py) and the
+#       Welch spectra of ufft all return ascending frequency vectors.
+#
+
+r"""Frequency band selection for spectrum arrays.
+
+Frequencies are located by binary search on the (ascending) frequency vector
+and bands are returned as basic slices, so every array handed back is a view
+of the spectrum and nothing is copied.  Two layouts are supported:
+
+* the mtm2 layout, a 2D array with the frequency in one column
+  (`spec_raw[:, 0]`), handled by `band_rows`, `extract_band` and
+  `trim_padding`;
+* a frequency vector plus any number of arrays sharing that axis (Lomb,
+  Welch), handled by `band_slice` and `extract_bands`."""
+
+import numpy as np
+
+
+def band_indices(freq, fmin=None, fmax=None):
+    r"""Half open index range [i0, i1) of the frequencies fmin <= f <= fmax
+    in the ascending vector `freq`.  None leaves that side open."""
+
+    freq = np.asarray(freq)
+    i0 = 0 if fmin is None else int(np.searchsorted(freq, fmin, side='left'))
+    i1 = freq.size if fmax is None else \
+        int(np.searchsorted(freq, fmax, side='right'))
+    return i0, max(i0, i1)
+
+
+def band_slice(freq, fmin=None, fmax=None):
+    r"""Slice selecting fmin <= f <= fmax along a frequency axis."""
+    return slice(*band_indices(freq, fmin, fmax))
+
+
+def band_rows(spec, fmin=None, fmax=None, col=0):
+    r"""First and last row of the 2D spectrum `spec` whose frequency (column
+    `col`) lies in [fmin, fmax].  Equivalent to the old while loop search of
+    `mtm.find_inequalities`.  Raises ValueError when no row is in the
+    band."""
+
+    i0, i1 = band_indices(np.asarray(spec)[:, col], fmin, fmax)
+    if i0 == i1:
+        raise ValueError("No frequency in [%s, %s]." % (fmin, fmax))
+    return i0, i1 - 1
+
+
+def extract_band(spec, fmin=None, fmax=None, col=0):
+    r"""View of the rows of the 2D spectrum `spec` whose frequency (column
+    `col`) lies in [fmin, fmax]."""
+
+    spec = np.asanyarray(spec)
+    return spec[band_slice(spec[:, col], fmin, fmax)]
+
+
+def extract_bands(freq, arrays, fmin=None, fmax=None, axis=-1):
+    r"""Select fmin <= f <= fmax in `freq` and in every array of `arrays`
+    along `axis`.  Returns the frequency view and a list of views."""
+
+    sl = band_slice(freq, fmin, fmax)
+    out = []
+    for arr in arrays:
+        arr = np.asanyarray(arr)
+        index = [slice(None)] * arr.ndim
+        index[axis] = sl
+        out.append(arr[tuple(index)])
+    return np.asanyarray(freq)[sl], out
+
+
+def trim_padding(spec, col=0):
+    r"""Drop the zero rows that pad a fixed size Fortran output array.
+
+    The first row (f = 0) is always kept and the rows with a non-zero value
+    in column `col` are counted, as `mtm.resize_spec` did.  Returns a
+    view."""
+
+    spec = np.asanyarray(spec)
+    if spec.ndim != 2:
+        raise ValueError("Array must be 2D.")
+    size = 1 + np.count_nonzero(spec[1:, col])
+    if size == 1:
+        return spec
+    return spec[:size]
@@ -34,8 +34,10 @@ Para se ter uma análise melhor tem-se que tentar a Singular Spectrum Analysis
 import numpy as np
 import matplotlib.pyplot as plt
 
+from ssamtm import bands
 
-def lombscargle(ages, signal, ofac=4, hifac=1):
+
+def lombscargle(ages, signal, ofac=4, hifac=1, fmin=None, fmax=None):
     r"""Calculates Lomb-Scargle Periodogram.
 
     Enter `signal` at times `ages` to compute the periodogram, with
@@ -47,7 +49,11 @@ def lombscargle(ages, signal, ofac=4, hifac=1):
     Note: the significance returned is the false alarm probability of the null
     hypothesis, i.e. that the data is composed of independent Gaussian random
     variables.  Low probability values indicate a high degree of significance
-    in the associated periodic signal."""
+    in the associated periodic signal.
+
+    `fmin` and `fmax` restrict the computation to the frequencies in that
+    band (see `ssamtm.bands`); the significance still accounts for every
+    frequency up to `hifac` * Nyquist."""
 
     N, T = len(signal), ages.ptp()
 
@@ -60,6 +66,10 @@ def lombscargle(ages, signal, ofac=4, hifac=1):
     dt = 1.0 / (T * ofac)  # Interval for the frequencies.  Can be tweaked.
     freq = np.arange(start, stop + dt, dt)
 
+    # Estimate of the number of independent frequencies.
+    M = 2.0 * len(freq) / ofac
+    freq = freq[bands.band_slice(freq, fmin, fmax)]
+
     # Angular frequencies and constant offsets.
     w = 2.0 * np.pi * freq
     dot = np.dot(w[:, None], ages[None, :])
@@ -86,9 +96,6 @@ def lombscargle(ages, signal, ofac=4, hifac=1):
 
     power /= (2.0 * s2)
 
-    # Estimate of the number of independent frequencies.
-    M = 2.0 * len(freq) / ofac
-
     # Statistical significant of power.
     prob = M * np.exp(-power)
     inds = prob > 0.01
@@ -13,8 +13,13 @@
 # obs:  MultiTaper Spectral Analysis.
 #
 
-import mtm2
+try:
+    from ssamtm.mtm import mtm2
+except ImportError:
+    mtm2 = None
+from ssamtm.mtm import multitaper
 import numpy as np
+from ssamtm import bands
 import matplotlib.pyplot as plt
 #import matplotlib.font_manager as fm
 #from matplotlib import rcParams
@@ -96,6 +101,10 @@ def compute_mtm(arr, dt=1.0, npi=2, nwin=3, f1=0.0, f2=0.0, inorm=0, ispec=1,
     Constraint Option:
         icon = (0) min misfit, (1) min norm, (2) min slope, (3) min rough
         icon=0
+
+    When the compiled `mtm2` extension is not available the spectra are
+    computed by the NumPy estimator in `multitaper`, which returns the same
+    five arrays.  Either way the spectra cover only the [f1, f2] band.
     """
 
     if nwin > (2 * npi - 1):
@@ -110,20 +119,50 @@ def compute_mtm(arr, dt=1.0, npi=2, nwin=3, f1=0.0, f2=0.0, inorm=0, ispec=1,
         iplotftest = 0
         iplotresh = 0
 
+    if mtm2 is None:
+        return multitaper.mtm_mann(
+            arr, dt, npi, nwin, f1, f2, inorm, ispec, iresh, ithresh, inoise,
+            ilog, ismooth, isignal, irecon, nsignals, iplotresh, iplotftest,
+            iplotsmoo, iplotraw, iplotconf, icon)
+
     spec_raw, spec_resh, spec_smoo, spec_conf, recon_sig = mtm2.mtm_mann(
         arr, dt, npi, nwin, f1, f2, inorm, ispec, iresh, ithresh, inoise, ilog,
         ismooth, isignal, irecon, nsignals, iplotresh, iplotftest, iplotsmoo,
         iplotraw, iplotconf, icon)
 
-    spec_raw = resize_spec(spec_raw)
-    spec_resh = resize_spec(spec_resh)
-    spec_smoo = resize_spec(spec_smoo)
-    spec_conf = resize_spec(spec_conf)
+    # views of the [f1, f2] band, as the NumPy estimator returns
+    spec_raw = bands.extract_band(resize_spec(spec_raw), f1, f2)
+    spec_resh = bands.extract_band(resize_spec(spec_resh), f1, f2)
+    spec_smoo = bands.extract_band(resize_spec(spec_smoo), f1, f2)
+    spec_conf = bands.extract_band(resize_spec(spec_conf), f1, f2)
     recon_sig = resize_spec(recon_sig)
 
     return spec_raw, spec_resh, spec_smoo, spec_conf, recon_sig
 
 
+def compute_mtm_batch(arrs, dt=1.0, npi=2, nwin=3, f1=0.0, f2=0.0, inorm=0,
+                      ispec=1, iresh=1, ithresh=3, inoise=0, ilog=1, ismooth=1,
+                      isignal=0, irecon=0, nsignals=0):
+    r"""Compute the mtm spectra of many equally long series at once.
+
+    `arrs` is a (nseries, N) array.  The parameters are those of
+    `compute_mtm` and the same five arrays are returned, each with a leading
+    nseries axis.  The tapers are computed once and all the series and
+    tapers are transformed in a single FFT call.
+    """
+
+    if nwin > (2 * npi - 1):
+        nwin = 2 * npi - 1
+    if f2 == 0:
+        f2 = 0.5 / dt
+    if isignal == 2:
+        inoise = 2
+
+    return multitaper.mtm_mann_batch(arrs, dt, npi, nwin, f1, f2, inorm, ispec,
+                                     iresh, ithresh, inoise, ilog, ismooth,
+                                     isignal, irecon, nsignals)
+
+
 def plot_spec(spec_raw):
     fig, ax = plt.subplots()
     #prop = fm.FontProperties(fname='/Library/Fonts/Tahoma.ttf')
@@ -145,28 +184,13 @@ def plot_spec(spec_raw):
 
 
 def resize_spec(arr):
-    arr = np.asanyarray(arr)
-    if arr.ndim != 2:
-        raise ValueError("Array must be 2D.")
-    size = 1
-    nrow, ncol = arr.shape
-    for i in range(1, nrow):
-        if arr[i, 0] != 0:
-            size = size + 1
-    if size != 1:
-        arr = arr[0:size, 0:ncol]
-    return arr
+    r"""Trim the zero padding of a mtm2 output array (returns a view)."""
+    return bands.trim_padding(arr)
 
 
 def find_inequalities(arr, fmin, fmax):
-    if3 = 0
-    nrow, ncol = arr.shape
-    if7 = nrow - 1
-    while arr[if3, 0] < fmin and if3 < nrow:
-        if3 = if3 + 1
-    while arr[if7, 0] > fmax and if7 > 0:
-        if7 = if7 - 1
-    return if3, if7
+    r"""First and last row of `arr` with fmin <= frequency <= fmax."""
+    return bands.band_rows(arr, fmin, fmax)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+#
+# spectrogram.py
+#
+# purpose:  Sliding window multitaper spectrogram.
+# created:  19-Oct-2026
+#
+# obs:  Used to follow when the seiche modes of a bay switch on and off.
+#
+
+r"""Time resolved multitaper spectra.
+
+The record is cut into overlapping windows through a strided view (no
+copies), the tapers come from the taper cache once for the whole record and
+every window is transformed with all the tapers in one FFT call.  Long
+records can be split in blocks of windows that are processed on a thread
+pool (numpy's FFT releases the GIL)."""
+
+from __future__ import division
+
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import stats
+
+from ssamtm import bands
+from ssamtm.mtm import multitaper
+
+# Cove Island Harbour and Inner Boat Passage modes [s].
+seiche_periods = [16.8 * 60, 12.0 * 60, 8.0 * 60]
+
+
+def sliding_windows(x, nwin, step):
+    r"""Read-only (nwindows, nwin) view of `x` with windows starting every
+    `step` samples."""
+
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    count = (x.size - nwin) // step + 1
+    if count < 1:
+        raise ValueError("Series shorter than one window.")
+    view = as_strided(x, shape=(count, nwin),
+                      strides=(step * x.strides[0], x.strides[0]))
+    view.flags.writeable = False
+    return view
+
+
+def mtm_spectrogram(x, dt=1.0, nwin=1024, step=None, npi=2, ntapers=3,
+                    ispec=1, ithresh=3, nthreads=1, block=None, fmin=None,
+                    fmax=None):
+    r"""Multitaper spectrogram of the series `x` sampled every `dt`.
+
+    nwin, step : window length and hop, in samples (step defaults to half a
+                 window).
+    npi        : time-bandwidth product, ntapers the number of tapers.
+    ispec      : (0) high-resolution or (1) adaptive estimate.
+    ithresh    : F-test level, as in `compute_mtm`
+                 (0) 50% (1) 90% (2) 95% (3) 99% (4) 99.5% (5) 99.9%
+    nthreads   : number of threads; the windows are split in `block` sized
+                 groups (all windows in one group by default when nthreads
+                 is 1).
+    fmin, fmax : frequency band returned (None: from 0, up to Nyquist).
+
+    Returns the window centre times, the frequencies, the (time x frequency)
+    power and F-test arrays and the boolean mask of the F-test values above
+    the requested significance level, as views of the band.
+    """
+
+    if step is None:
+        step = nwin // 2
+    if ntapers > 2 * npi - 1:
+        ntapers = 2 * npi - 1
+
+    windows = sliding_windows(x, nwin, step)
+    count = windows.shape[0]
+    tapers, ratios = multitaper.dpss_tapers(nwin, npi, ntapers)
+    nfft = 2 ** int(np.ceil(np.log2(nwin)))
+    freq = np.fft.rfftfreq(nfft, dt)
+
+    power = np.empty((count, freq.size))
+    ftest = np.empty((count, freq.size))
+
+    def process(bounds):
+        i0, i1 = bounds
+        seg = windows[i0:i1]
+        yk = multitaper.eigencoefficients(seg, tapers, nfft)
+        sk = np.abs(yk) ** 2
+        if ispec == 1:
+            power[i0:i1] = multitaper.adaptive_weights(sk, ratios,
+                                                       seg.var(axis=-1))[0]
+        else:
+            power[i0:i1] = sk.mean(axis=-2)
+        ftest[i0:i1] = multitaper.harmonic_ftest(yk, tapers)[0]
+
+    if block is None:
+        block = count if nthreads <= 1 else -(-count // (4 * nthreads))
+    starts = range(0, count, block)
+    bounds = [(i, min(i + block, count)) for i in starts]
+    if nthreads <= 1 or len(bounds) == 1:
+        for b in bounds:
+            process(b)
+    else:
+        pool = ThreadPool(nthreads)
+        try:
+            pool.map(process, bounds)
+        finally:
+            pool.close()
+            pool.join()
+
+    times = (np.arange(count) * step + nwin / 2.) * dt
+    fcrit = stats.f.ppf(multitaper.thresholds[ithresh], 2, 2 * ntapers - 2)
+    freq, (power, ftest) = bands.extract_bands(freq, (power, ftest), fmin, fmax)
+    return times, freq, power, ftest, ftest > fcrit
+
+
+def track_modes(freq, power, significant, dt, nwin, periods=seiche_periods,
+                npi=2):
+    r"""Follow the modes of the given `periods` (same time units as `dt`)
+    through a spectrogram.
+
+    For each mode the peak power within the multitaper bandwidth around
+    1/period is returned as a (time x mode) array, together with a mask
+    telling whether any F-test value in that band was significant."""
+
+    df = freq[1] - freq[0]
+    # half the bandwidth, in whole frequency bins
+    half = max(1, int(np.ceil(npi / (nwin * dt) / df)))
+    centre = np.searchsorted(freq, 1. / np.asarray(periods, dtype=float))
+    fc = freq[0] + centre * df
+
+    amp = np.full((power.shape[0], fc.size), -np.inf)
+    on = np.zeros((power.shape[0], fc.size), dtype=bool)
+    for k, f in enumerate(fc):
+        # bins centre - half .. centre + half, the half bin margin keeps the
+        # edge bins in despite rounding
+        fband, (p, s) = bands.extract_bands(freq, (power, significant),
+                                             f - (half + .5) * df,
+                                             f + (half + .5) * df)
+        if fband.size:
+            amp[:, k] = p.max(axis=-1)
+            on[:, k] = s.any(axis=-1)
+    return amp, on
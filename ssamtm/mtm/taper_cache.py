@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+#
+# taper_cache.py
+#
+# purpose:  Persistent cache of DPSS (Slepian) taper sets.
+# created:  19-Oct-2026
+#
+# obs:  In-memory LRU in front of a directory of .npy files that are loaded
+#       memory-mapped.
+#
+
+r"""Cache of DPSS taper sets keyed on (N, NW, K).
+
+Solving the Slepian eigenproblem costs far more than the tapered FFTs when
+many windows of the same length are analysed, so every taper set and its
+concentration ratios are kept in a size limited in-memory LRU and written
+once to disk.  Later runs memory-map the stored arrays instead of solving the
+eigenproblem again.
+
+The default cache lives in $SEICHES_CACHE_DIR/dpss (~/.cache/seiches/dpss if
+the variable is not set).  Use `configure` to move it, resize it or switch
+the disk layer off (directory=None)."""
+
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+def default_directory():
+    root = os.environ.get('SEICHES_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache',
+                                       'seiches'))
+    return os.path.join(root, 'dpss')
+
+
+class TaperCache(object):
+    r"""LRU cache of (tapers, ratios) pairs with an optional disk layer.
+
+    max_entries, max_bytes : limits of the in-memory layer.
+    directory              : where the .npy files are stored (None keeps the
+                             cache in memory only).
+    max_disk_bytes         : the least recently used entries are removed once
+                             the directory grows beyond this size.
+    mmap                   : load the stored arrays with mmap_mode='r'.
+    """
+
+    def __init__(self, directory=None, max_entries=64, max_bytes=256 * 2 ** 20,
+                 max_disk_bytes=2 ** 30, mmap=True):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.mmap = mmap
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self._key(*key) in self._entries
+
+    @staticmethod
+    def _key(N, NW, K):
+        return (int(N), float(NW), int(K))
+
+    def _paths(self, key):
+        stem = 'dpss_N%d_NW%s_K%d' % (key[0], repr(key[1]), key[2])
+        return (os.path.join(self.directory, stem + '_tapers.npy'),
+                os.path.join(self.directory, stem + '_ratios.npy'))
+
+    def get(self, N, NW, K, compute):
+        r"""Return the (tapers, ratios) pair for (N, NW, K), calling
+        `compute(N, NW, K)` only when neither layer holds it."""
+
+        key = self._key(N, NW, K)
+        if key in self._entries:
+            value = self._entries.pop(key)
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+        value = self._load(key)
+        if value is None:
+            self.misses += 1
+            value = compute(*key)
+            self._store(key, value)
+        else:
+            self.hits += 1
+        for arr in value:
+            arr.flags.writeable = False
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        size = sum(arr.nbytes for arr in value)
+        self._entries[key] = value
+        self._nbytes += size
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 self._nbytes > self.max_bytes):
+            if len(self._entries) == 1:
+                break
+            _, old = self._entries.popitem(last=False)
+            self._nbytes -= sum(arr.nbytes for arr in old)
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        paths = self._paths(key)
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        mode = 'r' if self.mmap else None
+        try:
+            value = tuple(np.load(p, mmap_mode=mode) for p in paths)
+        except (IOError, OSError, ValueError):
+            return None
+        for p in paths:
+            os.utime(p, None)
+        return value
+
+    def _store(self, key, value):
+        if self.directory is None:
+            return
+        written = []
+        tmp = None
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            for path, arr in zip(self._paths(key), value):
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(arr))
+                os.rename(tmp, path)
+                tmp = None
+                written.append(path)
+        except (IOError, OSError):
+            # leave neither the temporary file nor half an entry behind
+            for path in ([tmp] if tmp is not None else []) + written:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        # the tapers and ratios files of an entry are evicted together, least
+        # recently used entry first; incomplete entries go before any other
+        entries = {}
+        for name in os.listdir(self.directory):
+            for suffix in ('_tapers.npy', '_ratios.npy'):
+                if name.startswith('dpss_') and name.endswith(suffix):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.setdefault(name[:-len(suffix)], []).append(
+                        (st.st_mtime, st.st_size, path))
+        total = sum(f[1] for files in entries.values() for f in files)
+        order = sorted(entries.values(),
+                       key=lambda files: (len(files) == 2, max(files)[0]))
+        for files in order:
+            if total <= self.max_disk_bytes:
+                break
+            for mtime, size, path in files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self, disk=False):
+        r"""Empty the in-memory layer, and the directory if `disk`."""
+        self._entries.clear()
+        self._nbytes = 0
+        if disk and self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith('dpss_') and name.endswith('.npy'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+default_cache = TaperCache(default_directory())
+
+
+def configure(directory=default_directory(), **kwargs):
+    r"""Replace the cache used by `multitaper.dpss_tapers`.  The keyword
+    arguments are those of `TaperCache`; directory=None disables the disk
+    layer."""
+    global default_cache
+    default_cache = TaperCache(directory, **kwargs)
+    return default_cache
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+#
+# peaks.py
+#
+# purpose:  Spectral peak picking and the seiche mode catalog.
+# created:  19-Oct-2026
+#
+# obs:  Works on any (freq, power) pair: MTM, Lomb or Welch spectra.
+#
+
+r"""Automatic detection of the significant spectral peaks.
+
+A peak is a local maximum of the spectrum that rises above its background:
+either a confidence level (the lower CI bound of a Welch estimate or a MTM
+red noise level) or a robust median-smoothed background.  The peak frequency
+and height are refined by fitting a parabola through the maximum and its two
+neighbours.
+
+The detected peaks of every bay and analysis window are collected in a
+`ModeCatalog`, a columnar store saved as one compressed .npz file, which can
+be queried across seasons."""
+
+from __future__ import division
+
+import os
+
+import numpy as np
+from scipy.ndimage import median_filter
+
+from ssamtm import bands
+
+peak_dtype = np.dtype([('index', np.int64), ('freq', np.float64),
+                       ('power', np.float64), ('background', np.float64),
+                       ('ratio', np.float64)])
+
+
+def median_background(power, fraction=0.05):
+    r"""Robust background: running median over a window of `fraction` of the
+    spectrum length on each side."""
+
+    width = 2 * max(1, int(fraction * np.shape(power)[-1])) + 1
+    return median_filter(np.asarray(power, dtype=np.float64), size=width,
+                         mode='nearest')
+
+
+def find_peaks(freq, power, background=None, lower=None, threshold=1.0,
+               fmin=None, fmax=None, log=False):
+    r"""Significant peaks of the spectrum `power` at the frequencies `freq`.
+
+    background : level a peak must exceed, `threshold` times (a confidence
+                 level array or scalar); the median background by default.
+    lower      : optional lower confidence bound of `power`; when given it is
+                 the lower bound that has to clear the background.
+    fmin, fmax : restrict the search to that band.
+    log        : fit the parabola to log(power), better suited to the
+                 Gaussian shaped peaks of tapered spectra.
+
+    Returns a structured array (index, freq, power, background, ratio)
+    ordered by frequency, where freq and power are the refined values."""
+
+    freq = np.asarray(freq, dtype=np.float64)
+    power = np.asarray(power, dtype=np.float64)
+    if background is None:
+        background = median_background(power)
+    background = np.broadcast_to(np.asarray(background, dtype=np.float64),
+                                 power.shape)
+    test = power if lower is None else np.asarray(lower, dtype=np.float64)
+
+    i0, i1 = bands.band_indices(freq, fmin, fmax)
+    i0, i1 = max(i0, 1), min(i1, power.size - 1)
+    if i1 <= i0:
+        return np.zeros(0, dtype=peak_dtype)
+
+    mid = power[i0:i1]
+    is_peak = (mid > power[i0 - 1:i1 - 1]) & (mid >= power[i0 + 1:i1 + 1]) & \
+        (test[i0:i1] > threshold * background[i0:i1])
+    idx = np.flatnonzero(is_peak) + i0
+
+    a, b, c = power[idx - 1], power[idx], power[idx + 1]
+    if log:
+        tiny = np.finfo(float).tiny
+        a, b, c = [np.log(np.maximum(v, tiny)) for v in (a, b, c)]
+    denom = a - 2 * b + c
+    safe = np.where(denom == 0, 1., denom)
+    delta = np.where(denom == 0, 0., 0.5 * (a - c) / safe)
+    height = b - 0.25 * (a - c) * delta
+    if log:
+        height = np.exp(height)
+
+    df = np.where(delta >= 0, freq[np.minimum(idx + 1, freq.size - 1)] - freq[idx],
+                  freq[idx] - freq[idx - 1])
+    out = np.empty(idx.size, dtype=peak_dtype)
+    out['index'] = idx
+    out['freq'] = freq[idx] + delta * df
+    out['power'] = height
+    out['background'] = background[idx]
+    out['ratio'] = height / np.where(background[idx] == 0, np.inf, background[idx])
+    return out
+
+
+class ModeCatalog(object):
+    r"""Columnar catalog of the spectral peaks found per bay and window.
+
+    Every column is a NumPy array; bay names are stored once and referenced
+    by a small integer code.  `save` writes all the columns to a compressed
+    .npz file and `ModeCatalog(path)` reads it back.
+
+    >>> cat = ModeCatalog('modes.npz')
+    >>> cat.add('Tob-IBP', t0, t1, peaks.find_peaks(freq, mx, lower=x05))
+    >>> cat.save()
+    >>> cat.query(bay='Tob-IBP', period_min=0.1, period_max=0.3)
+    """
+
+    columns = [('bay', np.int16), ('start', np.float64), ('end', np.float64),
+               ('freq', np.float64), ('period', np.float64),
+               ('power', np.float64), ('ratio', np.float64),
+               ('phase', np.float64)]
+
+    def __init__(self, path=None):
+        self.path = path
+        self.bays = []
+        self._data = dict((name, np.zeros(0, dtype=dtype))
+                          for name, dtype in self.columns)
+        self._pending = []
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        self._flush()
+        return self._data['freq'].size
+
+    def _code(self, bay):
+        if bay not in self.bays:
+            self.bays.append(bay)
+        return self.bays.index(bay)
+
+    def add(self, bay, start, end, peaks, phase=None, period_scale=1. / 3600):
+        r"""Append the `peaks` (as returned by `find_peaks`) found in the
+        window [start, end] of `bay`.  `period_scale` converts 1/freq to the
+        stored period units (hours for frequencies in Hz)."""
+
+        n = peaks.size
+        if n == 0:
+            return
+        block = {'bay': np.full(n, self._code(bay), dtype=np.int16),
+                 'start': np.full(n, start, dtype=np.float64),
+                 'end': np.full(n, end, dtype=np.float64),
+                 'freq': peaks['freq'],
+                 'period': period_scale / peaks['freq'],
+                 'power': peaks['power'],
+                 'ratio': peaks['ratio'],
+                 'phase': np.full(n, np.nan) if phase is None else
+                 np.asarray(phase, dtype=np.float64)[peaks['index']]}
+        self._pending.append(block)
+
+    def _flush(self):
+        if self._pending:
+            for name, dtype in self.columns:
+                self._data[name] = np.concatenate(
+                    [self._data[name]] + [b[name].astype(dtype) for b in self._pending])
+            self._pending = []
+
+    def column(self, name):
+        self._flush()
+        return self._data[name]
+
+    def query(self, bay=None, start=None, end=None, period_min=None,
+              period_max=None, min_ratio=None):
+        r"""Rows matching all the given conditions, as a structured array
+        with the bay names decoded.  Windows are selected when they overlap
+        [start, end]."""
+
+        self._flush()
+        d = self._data
+        mask = np.ones(d['freq'].size, dtype=bool)
+        if bay is not None:
+            if bay not in self.bays:
+                mask[:] = False
+            else:
+                mask &= d['bay'] == self.bays.index(bay)
+        if start is not None:
+            mask &= d['end'] >= start
+        if end is not None:
+            mask &= d['start'] <= end
+        if period_min is not None:
+            mask &= d['period'] >= period_min
+        if period_max is not None:
+            mask &= d['period'] <= period_max
+        if min_ratio is not None:
+            mask &= d['ratio'] >= min_ratio
+
+        width = max([len(b) for b in self.bays] + [1])
+        dtype = [('bay', 'U%d' % width)] + [c for c in self.columns if c[0] != 'bay']
+        out = np.empty(np.count_nonzero(mask), dtype=dtype)
+        names = np.array(self.bays + [''], dtype='U%d' % width)
+        out['bay'] = names[d['bay'][mask]]
+        for name, _ in self.columns[1:]:
+            out[name] = d[name][mask]
+        return out
+
+    def modes(self, bay, n=6, **kwargs):
+        r"""Periods and amplitudes of the `n` strongest peaks of `bay`, in the
+        form of the 'Period' and 'Amplitude' lists of `embayments`."""
+
+        rows = self.query(bay=bay, **kwargs)
+        rows = rows[np.argsort(rows['power'])[::-1][:n]]
+        rows = rows[np.argsort(rows['period'])[::-1]]
+        return rows['period'].tolist(), rows['power'].tolist()
+
+    def save(self, path=None):
+        path = self.path if path is None else path
+        self._flush()
+        np.savez_compressed(path, bays=np.array(self.bays, dtype='U'),
+                            **self._data)
+        self.path = path
+
+    def load(self, path):
+        with np.load(path) as f:
+            self.bays = [str(b) for b in f['bays']]
+            self._data = dict((name, f[name].astype(dtype))
+                              for name, dtype in self.columns)
+        self._pending = []
+        self.path = path
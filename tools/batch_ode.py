@@ -0,0 +1,133 @@
+import numpy as np
+
+######################################################
+# # Batched ODE integration                           #
+# #   N independent initial conditions are one state  #
+# #   array y (N, d) and f(y, t, *args) is evaluated  #
+# #   once per stage for all of them (vectorized      #
+# #   right-hand side, parameters broadcast per row)  #
+# #   - rk4:    fixed step, the output times are the  #
+# #             steps (optionally `substeps` each)    #
+# #   - dopri5: adaptive Dormand-Prince 5(4), one     #
+# #             step size for the batch from the      #
+# #             worst trajectory, cubic Hermite dense #
+# #             output at the requested times         #
+# # usage:                                            #
+# #     y = odeint(lorenz, x0, t)        # (len(t), N, 3)
+# #     y = odeint(helmholtz, y0, t, args = (w0, k, a, om),
+# #                method = 'dopri5', rtol = 1e-8)    #
+######################################################
+
+def lorenz(y, t, sigma = 10., beta = 8. / 3, rho = 28.0):
+    # time-derivative of a batch of Lorenz systems, y (..., 3)
+    x, yy, z = y[..., 0], y[..., 1], y[..., 2]
+    return np.stack((sigma * (yy - x), x * (rho - z) - yy, x * yy - beta * z), axis = -1)
+
+def helmholtz(y, t, w0, k, amplitude, omega, phase = 0.):
+    # embayment (Helmholtz) oscillator with quadratic channel friction
+    #     z'' + k |z'| z' + w0^2 z = w0^2 ze(t),  ze = amplitude sin(omega t + phase)
+    # y (..., 2) = (z, z'); every parameter may be one value per trajectory
+    z, dz = y[..., 0], y[..., 1]
+    ze = amplitude * np.sin(omega * t + phase)
+    return np.stack((dz, w0 ** 2 * (ze - z) - k * np.abs(dz) * dz), axis = -1)
+
+def rk4(f, y0, t, args = (), substeps = 1):
+    # classical Runge-Kutta, `substeps` equal steps between output times
+    y = np.array(y0, dtype = float)
+    t = np.asarray(t, dtype = float)
+    out = np.empty((len(t),) + y.shape)
+    out[0] = y
+    tmp = np.empty_like(y)
+    for i in range(len(t) - 1):
+        h = (t[i + 1] - t[i]) / substeps
+        for s in range(substeps):
+            ti = t[i] + s * h
+            k1 = f(y, ti, *args)
+            np.multiply(k1, .5 * h, out = tmp); tmp += y
+            k2 = f(tmp, ti + .5 * h, *args)
+            np.multiply(k2, .5 * h, out = tmp); tmp += y
+            k3 = f(tmp, ti + .5 * h, *args)
+            np.multiply(k3, h, out = tmp); tmp += y
+            k4 = f(tmp, ti + h, *args)
+            k2 += k3
+            k2 *= 2.
+            k2 += k1
+            k2 += k4
+            k2 *= h / 6.
+            y += k2
+        out[i + 1] = y
+    return out
+
+# Dormand-Prince 5(4) tableau
+_C = (0., 1. / 5, 3. / 10, 4. / 5, 8. / 9, 1., 1.)
+_A = ((),
+      (1. / 5,),
+      (3. / 40, 9. / 40),
+      (44. / 45, -56. / 15, 32. / 9),
+      (19372. / 6561, -25360. / 2187, 64448. / 6561, -212. / 729),
+      (9017. / 3168, -355. / 33, 46732. / 5247, 49. / 176, -5103. / 18656),
+      (35. / 384, 0., 500. / 1113, 125. / 192, -2187. / 6784, 11. / 84))
+# 5th minus 4th order weights
+_E = (71. / 57600, 0., -71. / 16695, 71. / 1920, -17253. / 339200, 22. / 525, -1. / 40)
+
+def dopri5(f, y0, t, args = (), rtol = 1e-6, atol = 1e-9, h0 = None,
+           max_steps = 100000, full_output = False):
+    # adaptive Dormand-Prince; the error of a step is the rms over the state
+    # of each trajectory, the worst trajectory sets the step size
+    y = np.array(y0, dtype = float)
+    t = np.asarray(t, dtype = float)
+    out = np.empty((len(t),) + y.shape)
+    out[0] = y
+    axes = tuple(range(1, y.ndim)) if y.ndim > 1 else None
+    tc, tend = t[0], t[-1]
+    h = (tend - tc) / 100. if h0 is None else h0
+    k = [None] * 7
+    k[0] = f(y, tc, *args)
+    nfev, nsteps, nrejected = 1, 0, 0
+    j = 1
+    while j < len(t):
+        if nsteps + nrejected >= max_steps:
+            raise RuntimeError('dopri5: more than %d steps' % max_steps)
+        h = min(h, tend - tc)
+        for s in range(1, 7):
+            ys = y.copy()
+            for a, ks in zip(_A[s], k):
+                if a:
+                    ys += (h * a) * ks
+            k[s] = f(ys, tc + _C[s] * h, *args)
+        nfev += 6
+        ynew = ys  # the last stage is the 5th order solution
+        err = sum((h * e) * ks for e, ks in zip(_E, k) if e)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(ynew))
+        norm = np.sqrt(np.mean((err / scale) ** 2, axis = axes))
+        norm = np.max(norm) if np.ndim(norm) else float(norm)
+
+        if norm <= 1. or h < 1e-14 * max(abs(tc), 1.):
+            tn = tc + h
+            # cubic Hermite dense output on [tc, tn]
+            while j < len(t) and t[j] <= tn:
+                th = (t[j] - tc) / h
+                h00 = (1 + 2 * th) * (1 - th) ** 2
+                h10 = th * (1 - th) ** 2
+                h01 = th ** 2 * (3 - 2 * th)
+                h11 = th ** 2 * (th - 1)
+                out[j] = h00 * y + h10 * h * k[0] + h01 * ynew + h11 * h * k[6]
+                j += 1
+            tc, y = tn, ynew
+            k[0] = k[6]  # first same as last
+            nsteps += 1
+        else:
+            nrejected += 1
+        h *= min(10., max(.2, .9 * (norm if norm > 0 else 1e-10) ** -.2))
+
+    if full_output:
+        return out, {'nsteps': nsteps, 'nrejected': nrejected, 'nfev': nfev}
+    return out
+
+def odeint(f, y0, t, args = (), method = 'rk4', **kw):
+    # integrate the batch y0 (N, d) over the times t, returns (len(t), N, d)
+    if method == 'rk4':
+        return rk4(f, y0, t, args, **kw)
+    if method == 'dopri5':
+        return dopri5(f, y0, t, args, **kw)
+    raise ValueError('unknown method %s' % method)
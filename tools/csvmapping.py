@@ -1,44 +1,158 @@
-import csv
+import csv, io
+import numpy as np
 from shapely.geometry import Point, mapping, Polygon
+import fiona
 from fiona import collection
 
+# records handed to fiona per writerecords call (one transaction each)
+BATCH = 10000
+
+def _parses(value, kind):
+    try:
+        kind(value)
+        return True
+    except ValueError:
+        return False
+
+def read_columns(fname, names, encoding = 'utf-8'):
+    # the columns `names` of a csv file with a header row as arrays: the
+    # numeric columns (by the first data row) in one np.loadtxt pass as
+    # floats, or ints when every value is whole; the others as unicode
+    # strings decoded with `encoding`
+    with io.open(fname, encoding = encoding) as f:
+        header = [h.strip() for h in f.readline().split(',')]
+        first = f.readline().split(',')
+    index = [header.index(name) for name in names]
+    numeric = sorted(set(i for i in index if _parses(first[i], float)))
+    text = sorted(set(index) - set(numeric))
+    columns = {}
+    if numeric:
+        data = np.loadtxt(fname, delimiter = ',', skiprows = 1, usecols = numeric, ndmin = 2)
+        for i, col in zip(numeric, data.T):
+            whole = _parses(first[i], int) and np.all(col == np.round(col))
+            columns[i] = col.astype(np.int64) if whole else col
+    if text:
+        data = np.loadtxt(fname, dtype = 'U', delimiter = ',', skiprows = 1, usecols = text,
+                          ndmin = 2, encoding = encoding)
+        for i, col in zip(text, data.T):
+            columns[i] = np.char.strip(col)
+    return [columns[i] for i in index]
+
+def group_rows(keys):
+    # unique keys and, for each, the row indices in file order
+    uniq, inverse = np.unique(keys, return_inverse = True)
+    order = np.argsort(inverse, kind = 'mergesort')
+    bounds = np.cumsum(np.bincount(inverse, minlength = len(uniq)))[:-1]
+    return uniq, np.split(order, bounds)
+
+def field_type(values):
+    kind = np.asarray(values).dtype.kind
+    return 'float' if kind == 'f' else 'int' if kind in 'iu' else 'str'
+
+def python_value(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def write_batched(records, path, schema, driver = 'GPKG', layer = None,
+                  crs = None, batch = BATCH):
+    # write an iterable of records in batches of `batch`; GeoPackage layers
+    # get an rtree spatial index
+    options = {'SPATIAL_INDEX': 'YES'} if driver == 'GPKG' else {}
+    count = 0
+    with fiona.open(path, 'w', driver = driver, schema = schema, layer = layer,
+                    crs = crs, **options) as output:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == batch:
+                output.writerecords(chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            output.writerecords(chunk)
+            count += len(chunk)
+    return count
+
+def point_records(x, y, properties):
+    # properties: {name: array}, one value per point
+    names = list(properties)
+    columns = [properties[name].tolist() for name in names]
+    for i, (px, py) in enumerate(zip(x.tolist(), y.tolist())):
+        yield {'geometry': {'type': 'Point', 'coordinates': (px, py)},
+               'properties': dict((name, col[i]) for name, col in zip(names, columns))}
+
+def group_records(x, y, keys, key_name, geometry = 'Polygon'):
+    # one Polygon (or LineString) per key through its points in file order;
+    # groups too small for the geometry are skipped
+    xy = np.column_stack((x, y))
+    uniq, groups = group_rows(keys)
+    minimum = 3 if geometry == 'Polygon' else 2
+    for key, rows in zip(uniq, groups):
+        if len(rows) < minimum:
+            continue
+        coords = xy[rows]
+        if geometry == 'Polygon':
+            if (coords[0] != coords[-1]).any():
+                coords = np.vstack((coords, coords[:1]))
+            coordinates = [coords.tolist()]
+        else:
+            coordinates = coords.tolist()
+        yield {'geometry': {'type': geometry, 'coordinates': coordinates},
+               'properties': {key_name: python_value(key)}}
+
+def export(fname, out, key = None, geometry = 'Point', x = 'lon', y = 'lat',
+           fields = (), driver = 'GPKG', layer = None, crs = None, batch = BATCH):
+    # bulk csv -> GeoPackage/shapefile conversion:
+    #   geometry = 'Point': one feature per row with the columns `fields`
+    #   geometry = 'Polygon' or 'LineString': one feature per value of the
+    #              column `key`, through its rows in file order
+    # returns the number of features written
+    if geometry == 'Point':
+        columns = read_columns(fname, [x, y] + list(fields))
+        properties = dict(zip(fields, columns[2:]))
+        schema = {'geometry': 'Point',
+                  'properties': dict((name, field_type(col)) for name, col in properties.items())}
+        records = point_records(columns[0], columns[1], properties)
+    else:
+        cx, cy, keys = read_columns(fname, [x, y, key])
+        schema = {'geometry': geometry, 'properties': {key: field_type(keys)}}
+        records = group_records(cx, cy, keys, key, geometry)
+    return write_batched(records, out, schema, driver, layer, crs, batch)
+
 def demo_points():
     schema = { 'geometry': 'Point', 'properties': { 'name': 'str' } }
     with collection(
         "some.shp", "w", "ESRI Shapefile", schema) as output:
         with open('some.csv', 'rb') as f:
             reader = csv.DictReader(f)
-            for row in reader:
-                point = Point(float(row['lon']), float(row['lat']))
-                output.write({
+            output.writerecords({
                     'properties': {
                         'name': row['name']
                     },
-                    'geometry': mapping(point)
-                })
+                    'geometry': mapping(Point(float(row['lon']), float(row['lat'])))
+                } for row in reader)
 
-def create_contours(fname):
+def create_contours(fname, out = "FMB.shp", driver = "ESRI Shapefile"):
+    # one polygon per depth (it used to be one polygon through all the rows
+    # tagged with the depth of the last row)
     schema = { 'geometry': 'Polygon', 'properties': { 'depth': 'str' } }
-    with collection(
-        "FMB.shp", "w", "ESRI Shapefile", schema) as output:
+    with collection(out, "w", driver, schema) as output:
         with open(fname, 'rb') as f:
-            reader = csv.DictReader(f)
-            polygon_coord = []
-
-            for row in reader:
-                polygon_coord.append((float(row['lon']), float(row['lat'])))
+            contours = {}
+            for row in csv.DictReader(f):
+                contours.setdefault(row['depth'], []).append((float(row['lon']), float(row['lat'])))
 
-            poly = Polygon(polygon_coord)
-            output.write({
+        output.writerecords({
                 'properties': {
-                    'depth': row['depth']
+                    'depth': depth
                 },
-                'geometry': mapping(poly)
-            })
+                'geometry': mapping(Polygon(coords))
+            } for depth, coords in sorted(contours.items()) if len(coords) >= 3)
 
 
 
 if __name__ == "__main__":
     # demo_points()
     create_contours('test.csv')
+    # the same contours in a spatial-indexed GeoPackage, written in batches
+    export('test.csv', 'FMB.gpkg', key = 'depth', geometry = 'Polygon')
     print "Done"
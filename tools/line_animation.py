@@ -1,5 +1,5 @@
 import numpy as np
-from scipy import integrate
+import batch_ode
 
 from matplotlib import pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
@@ -9,19 +9,39 @@ from matplotlib import animation
 N_trajectories = 20
 
 
-def lorentz_deriv((x, y, z), t0, sigma = 10., beta = 8. / 3, rho = 28.0):
-    """Compute the time-derivative of a Lorentz system."""
-    return [sigma * (y - x), x * (rho - z) - y, x * y - beta * z]
+def lorentz_deriv(xyz, t0, sigma = 10., beta = 8. / 3, rho = 28.0):
+    """Compute the time-derivative of a batch of Lorentz systems, xyz (N, 3)."""
+    return batch_ode.lorenz(xyz, t0, sigma, beta, rho)
 
 
 # Choose random starting points, uniformly distributed from -15 to 15
 np.random.seed(1)
 x0 = -15 + 30 * np.random.random((N_trajectories, 3))
 
-# Solve for the trajectories
+
+def integrate(f, x0, t, size = 50):
+    """Integrate the batch over t lazily, yielding (start, states) blocks of size time steps."""
+    x = x0
+    for start in range(0, len(t) - 1, size):
+        block = batch_ode.odeint(f, x, t[start:start + size + 1])
+        x = block[-1]
+        yield start + 1, block[1:]
+
+
+# All the trajectories are stepped at once, a block at a time as the
+# animation reaches it; x_t is (N_trajectories, time, 3), filled up to computed
 t = np.linspace(0, 4, 1000)
-x_t = np.asarray([integrate.odeint(lorentz_deriv, x0i, t)
-                  for x0i in x0])
+x_t = np.empty((N_trajectories, len(t), 3))
+x_t[:, 0] = x0
+computed = 1
+blocks = integrate(lorentz_deriv, x0, t)
+
+def solve_until(i):
+    global computed
+    while computed < i:
+        start, block = next(blocks)
+        computed = start + len(block)
+        x_t[:, start:computed] = block.transpose(1, 0, 2)
 
 # Set up figure & 3D axis for animation
 fig = plt.figure()
@@ -59,6 +79,7 @@ def init():
 def animate(i):
     # we'll step two time-steps per frame.  This leads to nice results.
     i = (2 * i) % x_t.shape[1]
+    solve_until(i)
 
     for line, pt, xi in zip(lines, pts, x_t):
         x, y, z = xi[:i].T
@@ -1,5 +1,7 @@
 import numpy as np
 import pylab as pl
+from snapshots import SnapshotWriter, SnapshotReader
+import shallow_water_fv as fv
 
 ######################################################
 # # - usage from command line:                        #
@@ -10,6 +12,9 @@ import pylab as pl
 # # - usage from within ipython:                      #
 # #     from shallowWater import *                    #
 # #     shallowWater(100,1.,0.01)                     #
+# # - keep every 10th step in the snapshot dir 'run': #
+# #     shallowWater(100,1.,0.01,'run',10)            #
+# #     readSnapshots('run')                          #
 ######################################################
 
 # Courant Friedrichs Levy condition (CFL) is a necessary condition for convergence
@@ -18,7 +23,16 @@ CFL = 0.99
 g = 9.80665
 
 # # shallow water solver 1 dimension
-def shallowWater(n, XMAX, TMAX):
+def shallowWater(n, XMAX, TMAX, output = None, every = 1, plotEvery = 1,
+                 flux = None, diagnostics = None):
+    # output: snapshot directory (see snapshots.py) receiving every
+    # every-th step; None writes the first and last step to result.dat
+    # plotEvery: redraw the figure every plotEvery steps (0 only at the end)
+    # flux: 'hll', 'roe' or 'lxf' runs the MUSCL finite volume solver of
+    # shallow_water_fv instead of the Lax-Friedrichs scheme below
+    # diagnostics: hook called after every step as
+    # diagnostics(step, t, h, u, None, dt, dx), e.g. ShallowWater/diagnostics
+    # Diagnostics(g = g), which raises SimulationDiverged on a blow up
 
     TMAX *= XMAX
 
@@ -39,8 +53,19 @@ def shallowWater(n, XMAX, TMAX):
 
     # time starts at zero
     tsum = 0.
-    saveToFile(h, tsum, n, 'result.dat', 'w')
-    saveToFile(hu, tsum, n, 'result.dat', 'a')
+    if output is None:
+        saveToFile(h, tsum, n, 'result.dat', 'w')
+        saveToFile(hu, tsum, n, 'result.dat', 'a')
+    else:
+        out = SnapshotWriter(output, {'h': n + 2, 'hu': n + 2}, every = every,
+                             attrs = {'CFL': CFL, 'g': g, 'n': n, 'XMAX': XMAX})
+        out.append(tsum, h = h, hu = hu)
+
+    if flux is not None:
+        h, hu, tsum = finiteVolume(x, h, hu, dx, TMAX, flux,
+                                   None if output is None else out, plotEvery,
+                                   diagnostics)
+    nstep = 0
     # loop over time
     while tsum < TMAX:
 
@@ -50,10 +75,10 @@ def shallowWater(n, XMAX, TMAX):
         # h = periodicBoundaryConditions(h)
         # hu = periodicBoundaryConditions(hu)
 
-        # calculate fluxes at cell interfaces and largest eigenvalue
-        fhp, fhup, eigp = fluxes(h[1:], hu[1:])
-        fhm, fhum, eigm = fluxes(h[:-1], hu[:-1])
-        maxeig = max(eigp, eigm)
+        # calculate fluxes of every cell once, and largest eigenvalue
+        fh, fhu, maxeig = fluxes(h, hu)
+        fhp, fhup = fh[1:], fhu[1:]
+        fhm, fhum = fh[:-1], fhu[:-1]
 
         # calculate time step according to CFL-condition
         dt = calculateDt(dx, maxeig, tsum, TMAX)
@@ -68,13 +93,51 @@ def shallowWater(n, XMAX, TMAX):
         # update inner points
         h[1:-1] -= lambd * (Rh[1:] - Rh[:-1])
         hu[1:-1] -= lambd * (Rhu[1:] - Rhu[:-1])
-        plotVars(x, h, hu, tsum)
+        nstep += 1
+        if diagnostics is not None:
+            diagnostics(nstep, tsum, h[1:-1], hu[1:-1] / h[1:-1], None, dt, dx)
+        if plotEvery and nstep % plotEvery == 0:
+            plotVars(x, h, hu, tsum)
+        if output is not None:
+            out.append(tsum, h = h, hu = hu)
 
     # end while (time loop)
-    saveToFile(h, tsum, n, 'result.dat', 'a')
-    saveToFile(hu, tsum, n, 'result.dat', 'a')
+    plotVars(x, h, hu, tsum)
+    if output is None:
+        saveToFile(h, tsum, n, 'result.dat', 'a')
+        saveToFile(hu, tsum, n, 'result.dat', 'a')
+    else:
+        out.close()
     pl.show()
 
+def finiteVolume(x, h, hu, dx, TMAX, flux, out = None, plotEvery = 1,
+                 diagnostics = None):
+    # run shallow_water_fv on the interior cells with the Neumann boundaries
+    # used here; returns h, hu with ghost cells and the end time
+    def callback(t, hi, hui):
+        if t == 0:
+            return
+        callback.dt = t - callback.t
+        callback.nstep += 1
+        callback.t = t
+        if diagnostics is not None:
+            diagnostics(callback.nstep, t, hi, hui / np.maximum(hi, fv.HMIN),
+                        None, callback.dt, dx)
+        hg = neumannBoundaryConditions(addGhostCells(hi))
+        hug = neumannBoundaryConditions(addGhostCells(hui))
+        if out is not None:
+            out.append(t, h = hg, hu = hug)
+        if plotEvery and callback.nstep % plotEvery == 0:
+            plotVars(x, hg, hug, t)
+
+    callback.t = 0.
+    callback.nstep = 0
+    hi, hui, _ = fv.solve(h[1:-1], hu[1:-1], dx, TMAX, flux = flux,
+                          bc = 'neumann', CFL = CFL, callback = callback)
+    h = neumannBoundaryConditions(addGhostCells(hi))
+    hu = neumannBoundaryConditions(addGhostCells(hui))
+    return h, hu, callback.t
+
 def plotVars(x, h, hu, time, clear = True):
     time = '{0:.5f}'.format(time)
     pl.figure(1)
@@ -103,7 +166,7 @@ def readFromFile(name, clear = True):
     ff = open(name, 'rb')
     data = np.fromfile(ff)
     ff.close()
-    numberCells = data[3]
+    numberCells = int(data[3])
     n = numberCells - 2  # -2 because of ghost cells
     numberParameters = 4  # t, CFL, g, n
     numberVariables = 2  # h,hu
@@ -117,6 +180,15 @@ def readFromFile(name, clear = True):
         print 'data file inconsistent'
     return data
 
+def readSnapshots(name, frame = -1, clear = True):
+    # plot one stored frame (the last by default) of a snapshot directory
+    run = SnapshotReader(name)
+    t, data = run.frame(frame)
+    n = run.attrs['n']
+    pl.ion()
+    plotVars((1. / 2. + np.arange(n)) / n, data['h'], data['hu'], t, clear)
+    return run
+
 def error(name, nameReference):
     data = readFromFile(name, True)
     dataRef = readFromFile(nameReference, False)
@@ -199,6 +271,10 @@ if __name__ == "__main__":
     p.add_option("--n", type = "int", help = "number of points")
     p.add_option("--XMAX", type = "float", help = "length of domain")
     p.add_option("--TMAX", type = "float", help = "time of simulation")
+    p.add_option("--output", type = "string", help = "snapshot directory")
+    p.add_option("--every", type = "int", default = 1, help = "keep every n-th step")
+    p.add_option("--plotEvery", type = "int", default = 1, help = "redraw every n-th step")
+    p.add_option("--flux", type = "string", help = "hll, roe or lxf finite volume solver")
     (opts, args) = p.parse_args()
     if opts.n == None:
         n = 100
@@ -213,4 +289,5 @@ if __name__ == "__main__":
     else:
         TMAX = opts.TMAX
 
-    shallowWater(n, XMAX, TMAX)
+    shallowWater(n, XMAX, TMAX, opts.output, opts.every, opts.plotEvery,
+                 opts.flux)
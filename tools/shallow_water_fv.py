@@ -0,0 +1,165 @@
+import numpy as np
+
+######################################################
+# # 1-D shallow water finite volume solver            #
+# #   - HLL or Roe flux (or the Lax-Friedrichs flux of #
+# #     shallow_water_boundary), once per interface    #
+# #   - MUSCL (minmod) reconstruction + SSP-RK2        #
+# #   - batch: rows of h, hu are independent channels, #
+# #     each with its own dx, stepped together         #
+# #   - callback(t, h, hu) every `every` steps         #
+# # usage:                                            #
+# #     h0, hu0, dx = channels([500., 1000.], [2., 5.], 200)
+# #     h, hu, nsteps = solve(h0, hu0, dx, 600., flux = 'roe')
+######################################################
+
+CFL = 0.9
+g = 9.80665
+# two ghost cells on each side, needed by the MUSCL slopes
+NG = 2
+HMIN = 1e-8
+
+def channels(lengths, depths, n, amplitude = 0.1, width = 0.05):
+    # still water of the given depths in channels of the given lengths with
+    # a gaussian hump of relative width `width` in the middle, n cells each
+    lengths = np.atleast_1d(np.asarray(lengths, dtype = float))
+    depths = np.atleast_1d(np.asarray(depths, dtype = float))
+    lengths, depths = np.broadcast_arrays(lengths, depths)
+    dx = lengths / n
+    x = (np.arange(n) + .5)[None, :] * dx[:, None]
+    L = lengths[:, None]
+    h = depths[:, None] + amplitude * np.exp(-((x - L / 2.) / (width * L)) ** 2)
+    return h, np.zeros_like(h), dx
+
+def addGhostCells(var):
+    var = np.atleast_2d(var)
+    return np.pad(var, ((0, 0), (NG, NG)), 'constant')
+
+def boundaryConditions(h, hu, bc = 'neumann'):
+    # fill the ghost cells in place
+    if bc == 'periodic':
+        h[:, :NG], hu[:, :NG] = h[:, -2 * NG:-NG], hu[:, -2 * NG:-NG]
+        h[:, -NG:], hu[:, -NG:] = h[:, NG:2 * NG], hu[:, NG:2 * NG]
+        return
+    # mirror the interior cells: zero gradient, walls also flip hu
+    sign = -1. if bc == 'wall' else 1.
+    h[:, :NG] = h[:, 2 * NG - 1:NG - 1:-1]
+    h[:, -NG:] = h[:, -NG - 1:-2 * NG - 1:-1]
+    hu[:, :NG] = sign * hu[:, 2 * NG - 1:NG - 1:-1]
+    hu[:, -NG:] = sign * hu[:, -NG - 1:-2 * NG - 1:-1]
+
+def minmod(a, b):
+    return np.where(a * b > 0, np.sign(a) * np.minimum(np.abs(a), np.abs(b)), 0.)
+
+def reconstruct(q, muscl = True):
+    # left and right states at the n + 1 interfaces of the interior cells
+    n = q.shape[-1] - 2 * NG
+    if not muscl:
+        return q[:, NG - 1:n + NG], q[:, NG:n + NG + 1]
+    d = np.diff(q, axis = -1)
+    s = minmod(d[:, :-1], d[:, 1:])  # slope of the cells 1 .. N-2
+    qL = q[:, NG - 1:n + NG] + 0.5 * s[:, NG - 2:n + NG - 1]
+    qR = q[:, NG:n + NG + 1] - 0.5 * s[:, NG - 1:n + NG]
+    return qL, qR
+
+def physicalFlux(h, hu):
+    u = hu / np.maximum(h, HMIN)
+    return hu, hu * u + .5 * g * h ** 2, u
+
+def interfaceFlux(hL, huL, hR, huR, flux = 'hll'):
+    # numerical flux of (h, hu) at every interface and the largest wave speed
+    hL = np.maximum(hL, 0.)
+    hR = np.maximum(hR, 0.)
+    fhL, fhuL, uL = physicalFlux(hL, huL)
+    fhR, fhuR, uR = physicalFlux(hR, huR)
+    cL = np.sqrt(g * hL)
+    cR = np.sqrt(g * hR)
+
+    # Roe averages
+    sL_, sR_ = np.sqrt(hL), np.sqrt(hR)
+    hbar = .5 * (hL + hR)
+    ubar = (sL_ * uL + sR_ * uR) / np.maximum(sL_ + sR_, HMIN)
+    cbar = np.sqrt(g * hbar)
+
+    if flux == 'lxf':
+        a = np.maximum(np.abs(uL) + cL, np.abs(uR) + cR)
+        Fh = .5 * (fhL + fhR) - .5 * a * (hR - hL)
+        Fhu = .5 * (fhuL + fhuR) - .5 * a * (huR - huL)
+        return Fh, Fhu, a.max(axis = -1)
+
+    if flux == 'roe':
+        l1, l2 = ubar - cbar, ubar + cbar
+        dh, dhu = hR - hL, huR - huL
+        c2 = np.maximum(2. * cbar, HMIN)
+        a1 = ((ubar + cbar) * dh - dhu) / c2
+        a2 = (dhu - (ubar - cbar) * dh) / c2
+        # Harten entropy fix on the transonic rarefactions
+        delta = .1 * cbar + HMIN
+        fix = lambda l: np.where(np.abs(l) < delta, (l ** 2 + delta ** 2) / (2 * delta), np.abs(l))
+        l1a, l2a = fix(l1), fix(l2)
+        Fh = .5 * (fhL + fhR) - .5 * (l1a * a1 + l2a * a2)
+        Fhu = .5 * (fhuL + fhuR) - .5 * (l1a * a1 * l1 + l2a * a2 * l2)
+        return Fh, Fhu, np.maximum(np.abs(l1), np.abs(l2)).max(axis = -1)
+
+    # HLL with the Einfeldt wave speed estimates
+    sL = np.minimum(uL - cL, ubar - cbar)
+    sR = np.maximum(uR + cR, ubar + cbar)
+    den = np.where(sR - sL > 0, sR - sL, 1.)
+    Fh = np.where(sL >= 0, fhL, np.where(sR <= 0, fhR,
+                  (sR * fhL - sL * fhR + sL * sR * (hR - hL)) / den))
+    Fhu = np.where(sL >= 0, fhuL, np.where(sR <= 0, fhuR,
+                   (sR * fhuL - sL * fhuR + sL * sR * (huR - huL)) / den))
+    return Fh, Fhu, np.maximum(np.abs(sL), np.abs(sR)).max(axis = -1)
+
+def rhs(h, hu, dx, flux = 'hll', muscl = True, bc = 'neumann'):
+    # -(F[i+1/2] - F[i-1/2]) / dx of the interior cells and the wave speed
+    boundaryConditions(h, hu, bc)
+    hL, hR = reconstruct(h, muscl)
+    huL, huR = reconstruct(hu, muscl)
+    Fh, Fhu, maxeig = interfaceFlux(hL, huL, hR, huR, flux)
+    return -np.diff(Fh, axis = -1) / dx, -np.diff(Fhu, axis = -1) / dx, maxeig
+
+def solve(h0, hu0, dx, TMAX, flux = 'hll', muscl = True, bc = 'neumann',
+          callback = None, every = 1, CFL = CFL):
+    # h0, hu0: (n,) or (nbatch, n) interior values, dx: scalar or (nbatch,)
+    # all the rows share the time step (the smallest CFL step of the batch)
+    # callback(t, h, hu) gets the interior views every `every` steps and at
+    # the end (1-D rows for 1-D input); returns the interior h, hu and the
+    # number of steps
+    squeeze = np.ndim(h0) == 1
+    h = addGhostCells(np.asarray(h0, dtype = float))
+    hu = addGhostCells(np.asarray(hu0, dtype = float))
+    dx = np.broadcast_to(np.asarray(dx, dtype = float).reshape(-1, 1),
+                         (h.shape[0], 1))
+    inner = slice(NG, -NG)
+    # what the callback sees: the batch, or the single row of a 1-D input
+    view = (lambda q: q[0, inner]) if squeeze else (lambda q: q[:, inner])
+
+    tsum = 0.
+    nsteps = 0
+    if callback is not None:
+        callback(tsum, view(h), view(hu))
+    while tsum < TMAX:
+        dh, dhu, maxeig = rhs(h, hu, dx, flux, muscl, bc)
+        dt = CFL * np.min(dx[:, 0] / np.maximum(maxeig, HMIN))
+        dt = min(dt, TMAX - tsum)
+        if muscl:
+            # SSP-RK2 (Heun), second order in time to match the MUSCL slopes
+            h1, hu1 = h.copy(), hu.copy()
+            h1[:, inner] += dt * dh
+            hu1[:, inner] += dt * dhu
+            dh1, dhu1, _ = rhs(h1, hu1, dx, flux, muscl, bc)
+            h[:, inner] = .5 * (h[:, inner] + h1[:, inner] + dt * dh1)
+            hu[:, inner] = .5 * (hu[:, inner] + hu1[:, inner] + dt * dhu1)
+        else:
+            h[:, inner] += dt * dh
+            hu[:, inner] += dt * dhu
+        tsum += dt
+        nsteps += 1
+        if callback is not None and (nsteps % every == 0 or tsum >= TMAX):
+            callback(tsum, view(h), view(hu))
+
+    h, hu = h[:, inner], hu[:, inner]
+    if squeeze:
+        h, hu = h[0], hu[0]
+    return h, hu, nsteps
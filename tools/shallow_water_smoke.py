@@ -0,0 +1,51 @@
+import os, shutil, sys, tempfile
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import shallow_water_boundary as swb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ShallowWater'))
+from diagnostics import Diagnostics
+
+######################################################
+# # Smoke run of shallow_water_boundary               #
+# #   a short run of every solver (flux = None is the #
+# #   Lax-Friedrichs scheme) in a temporary directory,#
+# #   fails if the final state is not finite or the   #
+# #   Diagnostics hook (ShallowWater/diagnostics.py)  #
+# #   stops the run                                   #
+# # usage:                                            #
+# #     python shallow_water_smoke.py                 #
+######################################################
+
+FLUXES = (None, 'lxf', 'hll', 'roe')
+
+def run(flux, n = 50, XMAX = 1., TMAX = 0.01, **kwargs):
+    # final h (with ghost cells) of a run without plotting, the result.dat
+    # of shallowWater goes to a temporary directory
+    cwd = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    try:
+        os.chdir(tmp)
+        swb.shallowWater(n, XMAX, TMAX, plotEvery = 0, flux = flux, **kwargs)
+        h = swb.readFromFile('result.dat', True)[-2, 4:]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+    if h.size != n + 2 or not np.all(np.isfinite(h)):
+        raise AssertionError('flux=%s: bad final state' % flux)
+    return h
+
+def smoke(fluxes = FLUXES, **kwargs):
+    # every step of every run goes through Diagnostics with its default
+    # limits, SimulationDiverged ends the smoke run
+    result = {}
+    for flux in fluxes:
+        diagnostics = Diagnostics(every = 1, g = swb.g)
+        h = result[flux] = run(flux, diagnostics = diagnostics, **kwargs)
+        courant = diagnostics.history['courant'].max()
+        print 'flux=%s: h in [%.4f, %.4f], Courant <= %.3f' % (flux, h.min(), h.max(), courant)
+    return result
+
+if __name__ == "__main__":
+    smoke()
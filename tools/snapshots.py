@@ -0,0 +1,224 @@
+"""
+Snapshot storage for shallow water runs.
+
+A run is stored in a directory:
+
+    meta.json          variables (shape, dtype), chunk size, attributes
+    times.npy          time of every stored frame
+    chunk_00000.npz    frames 0 .. chunk-1 of all variables (compress=True)
+    chunk_00000_h.npy  or one plain .npy per variable (compress=False),
+                       which the reader memory-maps
+
+SnapshotWriter.append copies the arrays (solvers reuse their buffers) and
+hands them to a background thread that groups them in chunks and writes
+them, so the time loop never waits on the disk.  Only every `every`-th
+frame is kept.  meta.json and times.npy are rewritten after each chunk, a
+run that stops early is still readable.
+
+>>> with SnapshotWriter('run1', {'h': (102,), 'hu': (102,)}, every=10) as out:
+...     out.append(t, h=h, hu=hu)
+>>> run = SnapshotReader('run1')
+>>> h = run.read('h', start=100, stop=200)   # only the chunks needed
+"""
+
+import json
+import os
+import threading
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import numpy as np
+
+_stop = object()
+
+
+class SnapshotWriter(object):
+
+    def __init__(self, path, variables, dtype=np.float64, chunk=64, every=1,
+                 compress=False, attrs=None, maxsize=16):
+        # variables: {name: frame shape}
+        self.path = path
+        self.variables = dict((k, tuple(int(d) for d in np.atleast_1d(s)))
+                              for k, s in variables.items())
+        self.dtype = np.dtype(dtype)
+        self.chunk = chunk
+        self.every = every
+        self.compress = compress
+        self.attrs = attrs or {}
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._count = 0
+        self._times = []
+        self._nchunks = 0
+        self._error = None
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, time, **arrays):
+        """
+        Offer one frame; stored if it is an every-th one.  Returns True when
+        the frame is kept.
+        """
+        if self._error is not None:
+            raise self._error
+        keep = self._count % self.every == 0
+        self._count += 1
+        if keep:
+            frame = dict((k, np.array(arrays[k], dtype=self.dtype))
+                         for k in self.variables)
+            self._queue.put((float(time), frame))
+        return keep
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(_stop)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def _work(self):
+        buf = dict((k, np.empty((self.chunk,) + s, dtype=self.dtype))
+                   for k, s in self.variables.items())
+        times = []
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _stop:
+                    break
+                t, frame = item
+                for k in self.variables:
+                    buf[k][len(times)] = frame[k]
+                times.append(t)
+                if len(times) == self.chunk:
+                    self._write_chunk(buf, times)
+                    times = []
+            if times:
+                self._write_chunk(buf, times)
+        except Exception as e:
+            self._error = e
+            # keep draining so append never blocks on a full queue
+            while self._queue.get() is not _stop:
+                pass
+
+    def _write_chunk(self, buf, times):
+        n = len(times)
+        name = os.path.join(self.path, 'chunk_%05d' % self._nchunks)
+        if self.compress:
+            np.savez_compressed(name + '.npz',
+                                **dict((k, v[:n]) for k, v in buf.items()))
+        else:
+            for k, v in buf.items():
+                np.save('%s_%s.npy' % (name, k), v[:n])
+        self._nchunks += 1
+        self._times.extend(times)
+        np.save(os.path.join(self.path, 'times.npy'), np.array(self._times))
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {'variables': dict((k, {'shape': list(s), 'dtype': self.dtype.str})
+                                  for k, s in self.variables.items()),
+                'chunk': self.chunk, 'every': self.every,
+                'compress': self.compress, 'nframes': len(self._times),
+                'nchunks': self._nchunks, 'attrs': self.attrs}
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=1)
+        os.rename(tmp, os.path.join(self.path, 'meta.json'))
+
+
+class SnapshotReader(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.chunk = self.meta['chunk']
+        self.attrs = self.meta['attrs']
+        self.variables = list(self.meta['variables'])
+        tfile = os.path.join(path, 'times.npy')
+        self.times = np.load(tfile) if os.path.exists(tfile) else np.zeros(0)
+        # frames of the chunks written after meta.json was read are ignored
+        self.times = self.times[:self.meta['nframes']]
+
+    def __len__(self):
+        return self.times.size
+
+    def _chunk(self, name, c):
+        base = os.path.join(self.path, 'chunk_%05d' % c)
+        if self.meta['compress']:
+            with np.load(base + '.npz') as f:
+                return f[name]
+        return np.load('%s_%s.npy' % (base, name), mmap_mode='r')
+
+    def read(self, name, start=0, stop=None, step=1):
+        """
+        Frames start:stop:step of variable name as a (nframes, ...) array.
+        Only the chunks overlapping the range are opened; a range inside a
+        single uncompressed chunk is returned as a memory map view.
+        """
+        start, stop, step = slice(start, stop, step).indices(len(self))
+        if step < 0:
+            raise ValueError("Negative steps are not supported.")
+        idx = np.arange(start, stop, step)
+        if idx.size == 0:
+            shape = tuple(self.meta['variables'][name]['shape'])
+            return np.zeros((0,) + shape, dtype=self.meta['variables'][name]['dtype'])
+        c0, c1 = idx[0] // self.chunk, idx[-1] // self.chunk
+        parts = []
+        for c in range(c0, c1 + 1):
+            lo = max(start, c * self.chunk)
+            # first index of the range inside this chunk
+            lo = lo + (start - lo) % step
+            hi = min(stop, (c + 1) * self.chunk)
+            if lo >= hi:
+                continue
+            data = self._chunk(name, c)
+            parts.append(data[lo - c * self.chunk:hi - c * self.chunk:step])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def frame(self, i):
+        """
+        Frame i as (time, {name: array})
+        """
+        i = range(len(self))[i]
+        return self.times[i], dict((k, self.read(k, i, i + 1)[0])
+                                   for k in self.variables)
+
+    def select(self, tmin=None, tmax=None):
+        """
+        Frame range [start, stop) of the times tmin <= t <= tmax
+        """
+        start = 0 if tmin is None else int(np.searchsorted(self.times, tmin, 'left'))
+        stop = len(self) if tmax is None else int(np.searchsorted(self.times, tmax, 'right'))
+        return start, stop
+
+
+def record(trajectory, path, nframes, every=1, names=('eta', 'u', 'v'), **kw):
+    """
+    Store nframes states of a (eta, u, v, time) generator such as
+    evolveEuler or ShallowWater2D.evolve, keeping every every-th one.
+    Returns the last state.
+    """
+    state = next(trajectory)
+    shape = np.shape(state[0])
+    with SnapshotWriter(path, dict((k, shape) for k in names), every=every,
+                        **kw) as out:
+        for i in range(nframes * every):
+            if i:
+                state = next(trajectory)
+            out.append(state[-1], **dict(zip(names, state[:-1])))
+    return state
@@ -0,0 +1,179 @@
+import csv
+import numpy as np
+from scipy.spatial import cKDTree
+
+######################################################
+# # Logger station registry and spatial indexes       #
+# #   - stations: name -> lat, lon (+ attributes)     #
+# #   - StationIndex: kd-tree on unit vectors, great  #
+# #     circle nearest station / radius queries and   #
+# #     stations inside a bay polygon                 #
+# #   - ContourIndex: uniform grid over the bounding  #
+# #     boxes of contour polygons (see csvmapping),   #
+# #     contour at a point                            #
+# # usage:                                            #
+# #     index = StationIndex(stations)                #
+# #     names, dist = index.nearest(43.3, -79.8, k = 2)
+# #     index.within(bay_lon, bay_lat)                #
+# #     contours = ContourIndex.from_csv('test.csv', 'depth')
+# #     contours.locate(x, y)                         #
+######################################################
+
+EARTH_RADIUS = 6371000.
+
+# known logger positions, add more with register() or load_csv()
+stations = {
+    # lake gauge, placed in the lake not in the sheltered bay
+    'BUR': {'name': 'Burlington', 'lat': 43.333333, 'lon': -79.766667,
+            'filename': 'LO_Burlington-JAN-DEC-2011_date.csv'},
+}
+
+def register(key, lat, lon, **attrs):
+    entry = dict(attrs, lat = float(lat), lon = float(lon))
+    stations[key] = entry
+    return entry
+
+def load_csv(fname, key = 'name', lat = 'lat', lon = 'lon'):
+    # add the rows of a csv file with a header (key, lat, lon and any other
+    # columns, kept as attributes) to the registry
+    with open(fname, 'rb') as f:
+        for row in csv.DictReader(f):
+            attrs = dict((k, v) for k, v in row.items() if k not in (key, lat, lon))
+            register(row[key], row[lat], row[lon], **attrs)
+    return stations
+
+def unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype = float))
+    lon = np.radians(np.asarray(lon, dtype = float))
+    c = np.cos(lat)
+    return np.stack((c * np.cos(lon), c * np.sin(lon), np.sin(lat)), axis = -1)
+
+def chord_to_arc(chord):
+    # great circle distance in metres of a chord of the unit sphere
+    return 2. * EARTH_RADIUS * np.arcsin(np.minimum(np.asarray(chord) / 2., 1.))
+
+def arc_to_chord(distance):
+    return 2. * np.sin(np.minimum(np.asarray(distance, dtype = float) / (2. * EARTH_RADIUS), np.pi / 2))
+
+def points_in_polygon(x, y, px, py):
+    # even-odd rule for arrays of points x, y against the polygon px, py
+    # (closed or not), vectorized over the points
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    px = np.asarray(px, dtype = float)
+    py = np.asarray(py, dtype = float)
+    inside = np.zeros(x.shape, dtype = bool)
+    x1, y1 = px, py
+    x2, y2 = np.roll(px, -1), np.roll(py, -1)
+    for i in range(len(px)):
+        if y1[i] == y2[i]:
+            continue
+        crosses = (y1[i] > y) != (y2[i] > y)
+        xc = x1[i] + (y - y1[i]) * (x2[i] - x1[i]) / (y2[i] - y1[i])
+        inside ^= crosses & (x < xc)
+    return inside
+
+
+class StationIndex(object):
+
+    def __init__(self, registry = None):
+        registry = stations if registry is None else registry
+        self.keys = sorted(registry)
+        self.lat = np.array([registry[k]['lat'] for k in self.keys], dtype = float)
+        self.lon = np.array([registry[k]['lon'] for k in self.keys], dtype = float)
+        self.tree = cKDTree(unit_vectors(self.lat, self.lon).reshape(-1, 3))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def nearest(self, lat, lon, k = 1):
+        # nearest k stations of the point(s): station keys and great circle
+        # distances (m), shaped like the query (plus a last axis if k > 1)
+        k = min(k, len(self.keys))
+        chord, idx = self.tree.query(unit_vectors(lat, lon), k = k)
+        return np.asarray(self.keys, dtype = object)[idx], chord_to_arc(chord)
+
+    def nearest_index(self, lat, lon):
+        # positions in self.keys of the nearest station of every point, for
+        # joining model grids (lat, lon arrays of any shape)
+        lat, lon = np.broadcast_arrays(lat, lon)
+        _, idx = self.tree.query(unit_vectors(lat, lon).reshape(-1, 3))
+        return idx.reshape(lat.shape)
+
+    def within_radius(self, lat, lon, distance):
+        # keys of the stations closer than distance (m) to the point
+        idx = self.tree.query_ball_point(unit_vectors(lat, lon), arc_to_chord(distance))
+        return [self.keys[i] for i in sorted(idx)]
+
+    def within(self, polygon_lon, polygon_lat):
+        # keys of the stations inside the bay polygon, pre-selected by its
+        # bounding box
+        inbox = np.nonzero((self.lon >= np.min(polygon_lon)) & (self.lon <= np.max(polygon_lon)) &
+                           (self.lat >= np.min(polygon_lat)) & (self.lat <= np.max(polygon_lat)))[0]
+        inside = points_in_polygon(self.lon[inbox], self.lat[inbox], polygon_lon, polygon_lat)
+        return [self.keys[i] for i in inbox[inside]]
+
+
+class ContourIndex(object):
+    # polygons are (key, coordinates (n, 2)) pairs in the coordinates of the
+    # csv (x, y); every grid cell lists the polygons whose bounding box
+    # overlaps it, smallest polygon first so the innermost contour wins
+
+    def __init__(self, polygons, cells = 64):
+        polygons = [(key, np.asarray(coords, dtype = float)) for key, coords in polygons]
+        area = [abs(np.dot(c[:, 0], np.roll(c[:, 1], -1)) - np.dot(c[:, 1], np.roll(c[:, 0], -1))) / 2.
+                for key, c in polygons]
+        self.polygons = [polygons[i] for i in np.argsort(area, kind = 'mergesort')]
+        self.boxes = np.array([(c[:, 0].min(), c[:, 1].min(), c[:, 0].max(), c[:, 1].max())
+                               for key, c in self.polygons]).reshape(-1, 4)
+        self.origin = self.boxes[:, :2].min(axis = 0) if len(self.polygons) else np.zeros(2)
+        extent = self.boxes[:, 2:].max(axis = 0) - self.origin if len(self.polygons) else np.ones(2)
+        self.cells = cells
+        self.size = np.maximum(extent, 1e-12) / cells
+        self.grid = {}
+        for i, (x0, y0, x1, y1) in enumerate(self.boxes):
+            (i0, j0), (i1, j1) = self._cell(x0, y0), self._cell(x1, y1)
+            for ci in range(i0, i1 + 1):
+                for cj in range(j0, j1 + 1):
+                    self.grid.setdefault((ci, cj), []).append(i)
+
+    @classmethod
+    def from_csv(cls, fname, key = 'depth', x = 'lon', y = 'lat', cells = 64):
+        # contour polygons grouped by key, as written by csvmapping.export
+        import csvmapping
+        cx, cy, keys = csvmapping.read_columns(fname, [x, y, key])
+        polygons = [(rec['properties'][key], rec['geometry']['coordinates'][0])
+                    for rec in csvmapping.group_records(cx, cy, keys, key)]
+        return cls(polygons, cells)
+
+    def _cell(self, x, y):
+        c = np.floor((np.array([x, y], dtype = float) - self.origin) / self.size).astype(int)
+        return tuple(np.clip(c, 0, self.cells - 1))
+
+    def contour_at(self, x, y):
+        # key of the innermost contour polygon containing the point, or None
+        (x0, y0), (x1, y1) = self.origin, self.origin + self.size * self.cells
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            return None
+        for i in self.grid.get(self._cell(x, y), ()):
+            bx0, by0, bx1, by1 = self.boxes[i]
+            if bx0 <= x <= bx1 and by0 <= y <= by1:
+                key, c = self.polygons[i]
+                if points_in_polygon(x, y, c[:, 0], c[:, 1]):
+                    return key
+        return None
+
+    def locate(self, x, y):
+        # contour_at for arrays of points: one pass per polygon over the
+        # points of its bounding box still unassigned; None where no contour
+        x, y = np.broadcast_arrays(np.asarray(x, dtype = float), np.asarray(y, dtype = float))
+        found = np.full(x.shape, -1, dtype = int)
+        for i, (bx0, by0, bx1, by1) in enumerate(self.boxes):
+            cand = np.nonzero((found < 0) & (x >= bx0) & (x <= bx1) & (y >= by0) & (y <= by1))
+            if not len(cand[0]):
+                continue
+            key, c = self.polygons[i]
+            inside = points_in_polygon(x[cand], y[cand], c[:, 0], c[:, 1])
+            found[tuple(ix[inside] for ix in cand)] = i
+        keys = np.array([key for key, c in self.polygons] + [None], dtype = object)
+        return keys[found]
@@ -2,86 +2,135 @@ import matplotlib.pyplot as plt
 from matplotlib import cm
 from mpl_toolkits.mplot3d import axes3d
 import os, sys
+import multiprocessing
+import pickle
+import subprocess
 import numpy as np
 
 
-##### TO CREATE A SERIES OF PICTURES
+##### RENDERING PIPELINE: WORKER PROCESSES -> ENCODER STDIN
 
-def make_views(ax, angles, elevation = None, width = 4, height = 3,
-                prefix = 'tmprot_', **kwargs):
-    """
-    Makes jpeg pictures of the given 3d ax, with different angles.
-    Args:
-        ax (3D axis): te ax
-        angles (list): the list of angles (in degree) under which to
-                       take the picture.
-        width,height (float): size, in inches, of the output images.
-        prefix (str): prefix for the files created.
-
-    Returns: the list of files created (for later removal)
-    """
-
-    files = []
-    ax.figure.set_size_inches(width, height)
-
-    for i, angle in enumerate(angles):
+# state of a rendering worker: its own copy of the figure and the update
+# function
+_worker = {}
 
-        ax.view_init(elev = elevation, azim = angle)
-        fname = '%s%03d.jpeg' % (prefix, i)
-        ax.figure.savefig(fname)
-        files.append(fname)
+def _set_worker(fig, update):
+    # rendering needs an Agg canvas (the interactive Agg backends have one)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    if not isinstance(fig.canvas, FigureCanvasAgg):
+        FigureCanvasAgg(fig)
+    _worker['figure'] = fig
+    _worker['update'] = update
 
-    return files
+def _init_worker(figure, update):
+    _set_worker(pickle.loads(figure), update)
 
-
-
-##### TO TRANSFORM THE SERIES OF PICTURE INTO AN ANIMATION
-
-def make_movie(files, output, fps = 10, bitrate = 1800, **kwargs):
+def _render(frame):
     """
-    Uses mencoder, produces a .mp4/.ogv/... movie from a list of
-    picture files.
+    Draws one frame in the worker, returns (width, height, RGB bytes)
     """
-
-    output_name, output_ext = os.path.splitext(output)
-    command = { '.mp4' : 'mencoder "mf://%s" -mf fps=%d -o %s.mp4 -ovc lavc\
-                         -lavcopts vcodec=msmpeg4v2:vbitrate=%d'
-                         % (",".join(files), fps, output_name, bitrate)}
-
-    command['.ogv'] = command['.mp4'] + '; ffmpeg -i %s.mp4 -r %d %s' % (output_name, fps, output)
-
-    print command[output_ext]
-    output_ext = os.path.splitext(output)[1]
-    os.system(command[output_ext])
-
-
-
-def make_gif(files, output, delay = 100, repeat = True, **kwargs):
+    fig = _worker['figure']
+    _worker['update'](fig, frame)
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    # older matplotlib returns a flat buffer
+    rgba = np.frombuffer(fig.canvas.buffer_rgba(), np.uint8).reshape(height, width, 4)
+    return width, height, rgba[..., :3].tobytes()
+
+def _view(fig, frame):
+    # frame = (axis number, elevation, azimuth)
+    i, elevation, angle = frame
+    fig.axes[i].view_init(elev = elevation, azim = angle)
+
+def encoder_command(output, width, height, fps = 10, bitrate = 1800,
+                    delay = None, repeat = True, **kwargs):
     """
-    Uses imageMagick to produce an animated .gif from a list of
-    picture files.
+    ffmpeg command reading raw RGB frames of width x height from stdin and
+    writing the .mp4/.ogv/.gif output (delay: 1/100 s between gif frames)
     """
-
-    loop = -1 if repeat else 0
-    os.system('convert -delay %d -loop %d %s %s'
-              % (delay, loop, " ".join(files), output))
-
-
-
-
-def make_strip(files, output, **kwargs):
+    ext = os.path.splitext(output)[1]
+    if ext == '.gif' and delay is not None:
+        fps = 100. / delay
+    command = ['ffmpeg', '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % (width, height),
+               '-r', str(fps), '-i', '-']
+    if ext == '.gif':
+        command += ['-vf', 'split[a][b];[a]palettegen[p];[b][p]paletteuse',
+                    '-loop', '0' if repeat else '-1']
+    elif ext == '.ogv':
+        command += ['-c:v', 'libtheora', '-b:v', '%dk' % bitrate]
+    else:
+        # yuv420p needs even sizes
+        command += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-b:v', '%dk' % bitrate,
+                    '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+    return command + [output]
+
+def render_frames(fig, update, frames, processes = None, chunksize = 4):
     """
-    Uses imageMagick to produce a .jpeg strip from a list of
-    picture files.
+    Yields (width, height, RGB bytes) of every frame, in order: update(fig,
+    frame) is applied to a private copy of the pickled figure in each of
+    `processes` worker processes.  With processes == 1, or a figure that
+    cannot be pickled (3-D axes in older matplotlib), the live figure is
+    drawn in this process instead.  update must be a module level function.
     """
-
-    os.system('montage -tile 1x -geometry +0+0 %s %s' % (" ".join(files), output))
+    figure = None
+    if processes != 1:
+        try:
+            figure = pickle.dumps(fig, -1)
+        except Exception:
+            figure = None
+    if figure is None:
+        _set_worker(fig, update)
+        try:
+            for frame in frames:
+                yield _render(frame)
+        finally:
+            _worker.clear()
+        return
+    pool = multiprocessing.Pool(processes, _init_worker, (figure, update))
+    try:
+        for result in pool.imap(_render, frames, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+
+def encode(fig, update, frames, output, processes = None, **kwargs):
+    """
+    Renders the frames in parallel and pipes them to the encoder (.mp4,
+    .ogv, .gif), or stacks them into a strip (.jpeg, .png), without any
+    intermediate file. Returns the number of frames.
+    """
+    ext = os.path.splitext(output)[1]
+    rendered = render_frames(fig, update, frames, processes)
+    count = 0
+    if ext in ('.jpeg', '.jpg', '.png'):
+        import matplotlib.image
+        strip = [np.frombuffer(rgb, np.uint8).reshape(h, w, 3) for w, h, rgb in rendered]
+        matplotlib.image.imsave(output, np.concatenate(strip))
+        return len(strip)
+
+    encoder = None
+    try:
+        for width, height, rgb in rendered:
+            if encoder is None:
+                encoder = subprocess.Popen(encoder_command(output, width, height, **kwargs),
+                                           stdin = subprocess.PIPE)
+            encoder.stdin.write(rgb)
+            count += 1
+    finally:
+        if encoder is not None:
+            encoder.stdin.close()
+            encoder.wait()
+    if encoder is not None and encoder.returncode:
+        raise RuntimeError('ffmpeg failed with code %d' % encoder.returncode)
+    return count
 
 
 
 ##### MAIN FUNCTION
 
-def rotanimate(ax, angles, output, **kwargs):
+def rotanimate(ax, angles, output, elevation = None, width = 4, height = 3,
+               processes = None, **kwargs):
     """
     Produces an animation (.mp4,.ogv,.gif,.jpeg,.png) from a 3D plot on
     a 3D ax
@@ -92,28 +141,20 @@ def rotanimate(ax, angles, output, **kwargs):
                        show the plot.
         output : name of the output file. The extension determines the
                  kind of animation used.
+        processes : number of rendering processes (default: all the cores)
         **kwargs:
             - width : in inches
             - heigth: in inches
-            - framerate : frames per second
-            - delay : delay between frames in milliseconds
+            - fps : frames per second
+            - bitrate : kbit/s of the .mp4/.ogv
+            - delay : delay between frames in 1/100 s (.gif only)
             - repeat : True or False (.gif only)
     """
 
-    output_ext = os.path.splitext(output)[1]
-
-    files = make_views(ax, angles, **kwargs)
-
-    D = { '.mp4' : make_movie,
-          '.ogv' : make_movie,
-          '.gif': make_gif ,
-          '.jpeg': make_strip,
-          '.png':make_strip}
-
-    D[output_ext](files, output, **kwargs)
-
-    for f in files:
-        os.remove(f)
+    ax.figure.set_size_inches(width, height)
+    i = ax.figure.axes.index(ax)
+    frames = [(i, elevation, angle) for angle in angles]
+    return encode(ax.figure, _view, frames, output, processes, **kwargs)
 
 
 ##### EXAMPLE
@@ -128,7 +169,7 @@ if __name__ == '__main__':
 
     angles = np.linspace(0, 360, 21)[:-1]  # Take 20 angles between 0 and 360
 
-    # create an animated gif (20ms between frames)
+    # create an animated gif (0.2 s between frames)
     rotanimate(ax, angles, 'movie.gif', delay = 20)
 
     # create a movie with 10 frames per seconds and 'quality' 2000
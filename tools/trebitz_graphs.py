@@ -8,33 +8,123 @@ import scipy as sp
 import matplotlib.ticker as ticker
 import matplotlib.mlab as mlab
 import matplotlib.pyplot as plt
-import csv, sys
+import csv, json, os, sys
 
 import utools.stats as ustats
 
-def readFile(path_in, fname):
-    # read Lake data
+# schema of the response tables, one row per embayment:
+# 0.0545, 0.1297,LF ,0.8  ->  mouth area, relative amplitude, name, area (ha)
+response_schema = [('MouthArea', float), ('RelativeAmplit', float), ('Name', str), ('Area', float)]
+
+# parsed tables: filename -> (mtime, size, structured array, bad rows)
+_tables = {}
+# rows rejected in each file read: filename -> [(line, reason, row)]
+bad_rows = {}
+
+def _converts(value, kind):
+    try:
+        kind(value)
+        return True
+    except ValueError:
+        return False
+
+def _parse(filename, schema):
+    # one csv pass, then every column is converted at once; rows with a
+    # wrong number of fields or a value that does not convert are reported
+    with open(filename, 'rb') as ifile:
+        rows = [(n, row) for n, row in enumerate(csv.reader(ifile, delimiter = ',', quotechar = '"'), 1) if row]
+    # a first row whose numbers do not convert is the header
+    if rows and not all(_converts(v, kind) for v, (name, kind) in zip(rows[0][1], schema) if kind is not str):
+        rows = rows[1:]
+    # extra fields (e.g. the trailing comma of spreadsheet exports) are
+    # ignored, as the old reader did; only short rows are bad
+    bad = [(n, 'expected at least %d fields' % len(schema), row) for n, row in rows if len(row) < len(schema)]
+    rows = [(n, row[:len(schema)]) for n, row in rows if len(row) >= len(schema)]
+    columns = list(zip(*[row for n, row in rows])) or [()] * len(schema)
+
+    ok = np.ones(len(rows), dtype = bool)
+    values = []
+    for (name, kind), col in zip(schema, columns):
+        col = np.array(col, dtype = str)
+        if kind is not str:
+            try:
+                col = col.astype(kind)
+            except ValueError:
+                # look for the offending cells only when the fast path fails
+                good = np.array([_converts(v, kind) for v in col], dtype = bool)
+                for i in np.nonzero(~good & ok)[0]:
+                    bad.append((rows[i][0], '%s: %r' % (name, str(col[i])), rows[i][1]))
+                ok &= good
+                col = np.where(good, col, '0').astype(kind)
+        values.append(col)
+
+    table = np.empty(int(ok.sum()), dtype = [(name, col.dtype) for (name, kind), col in zip(schema, values)])
+    for (name, kind), col in zip(schema, values):
+        table[name] = col[ok]
+    return table, sorted(bad)
+
+def _report(filename, bad):
+    bad_rows[filename] = bad
+    if bad:
+        sys.stderr.write('%s: %d bad rows skipped: %s\n' %
+                         (filename, len(bad), ', '.join('line %d (%s)' % (n, why) for n, why, row in bad)))
+
+def _loadSidecars(filename, schema, mtime):
+    # the table and its bad rows as saved next to the csv, None if either
+    # is missing, older than the csv or of another schema
+    sidecars = filename + '.npy', filename + '.bad.json'
+    if not all(os.path.exists(f) and os.path.getmtime(f) >= mtime for f in sidecars):
+        return None
+    try:
+        table = np.load(sidecars[0])
+        with open(sidecars[1]) as f:
+            bad = [(n, why, row) for n, why, row in json.load(f)]
+    except (IOError, OSError, ValueError):
+        return None
+    if [n for n, k in schema] != list(table.dtype.names):
+        return None
+    return table, bad
+
+def readTable(path_in, fname, schema = response_schema, cache = True):
+    '''
+    Structured array of the csv file with the declared schema. Tables are
+    kept in memory and in a .npy file next to the csv (the rejected rows in
+    a .bad.json file), both keyed on the csv modification time, so only a
+    changed file is parsed again. The rejected rows are reported to stderr
+    and kept in bad_rows on every read.
+    '''
     filename = path_in + '/' + fname
+    st = os.stat(filename)
+    key = (st.st_mtime, st.st_size)
+    entry = _tables.get(filename)
+    if cache and entry is not None and entry[:2] == key:
+        _report(filename, entry[3])
+        return entry[2]
 
-    ifile = open(filename, 'rb')
-    reader = csv.reader(ifile, delimiter = ',', quotechar = '"')
-    rownum = 0
-    # 0.0545, 0.1297,LF ,0.8
-    MouthArea = []
-    RelativeAmplit = []
-    Name = []
-    Area = []
-    printHeaderVal = False
-    for row in reader:
-        try:
-            MouthArea.append(float(row[0]))
-            RelativeAmplit.append(float(row[1]))
-            Name.append(str(row[2]))
-            Area.append(float(row[3]))
-
-        except:
-            pass
-    # end for
+    loaded = _loadSidecars(filename, schema, st.st_mtime) if cache else None
+    if loaded is None:
+        table, bad = _parse(filename, schema)
+        if cache:
+            try:
+                np.save(filename + '.npy', table)
+                with open(filename + '.bad.json', 'w') as f:
+                    json.dump(bad, f)
+            except (IOError, OSError):
+                pass
+    else:
+        table, bad = loaded
+    _report(filename, bad)
+    if cache:
+        _tables[filename] = key + (table, bad)
+    return table
+
+def readFile(path_in, fname):
+    # read Lake data
+    table = readTable(path_in, fname)
+    MouthArea = table['MouthArea'].tolist()
+    RelativeAmplit = table['RelativeAmplit'].tolist()
+    Name = table['Name'].tolist()
+    Area = table['Area'].tolist()
 
     return [MouthArea, RelativeAmplit, Name, Area]
 # end readFile